@@ -0,0 +1,197 @@
+"""收集器端到端基准测试
+
+在临时目录中针对本地替身服务（见 fake_services.py）完整运行一次 ``Collector``,
+输出吞吐量（条/秒）、各阶段耗时（来自 utils.metrics）和各接口的请求次数. 可以把结果保存为基线,
+之后每次性能相关的改动都与基线对比.
+
+用法:
+    python -m benchmarks.collector_bench --pages 5 --items-per-page 20 --llm-latency 0.2
+    python -m benchmarks.collector_bench --save-baseline data/bench_baseline.json
+    python -m benchmarks.collector_bench --baseline data/bench_baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_services import FakeServices, FakeServiceOptions
+from logger import get_logger
+from models.config import Config, AccountInfo, DBInfo
+from utils.metrics import METRICS
+
+
+@contextmanager
+def working_directory(path: str):
+    """收集器使用相对路径 data/ 存放数据库, 基准测试在临时目录中运行"""
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def run(args) -> dict:
+    """启动替身服务并运行一次收集器
+
+    Returns:
+        dict: 基准测试报告
+    """
+    from collector import Collector
+    from crawlers.leijing import LeiJing
+    from filters.sqlite import SQLiteFilter
+    from parsers.openai import OpenAIParser
+    from storages.cloud189 import Cloud189, Cloud189Storage
+    from utils.job_queue import JobQueue
+
+    options = FakeServiceOptions(
+        pages=args.pages,
+        items_per_page=args.items_per_page,
+        llm_latency=args.llm_latency,
+        llm_rate_limit_every=args.rate_limit_every,
+        cloud_latency=args.cloud_latency,
+        unparseable_every=args.unparseable_every,
+        dead_share_every=args.dead_share_every,
+        duplicate_every=args.duplicate_every,
+        save_error_every=args.save_error_every
+    )
+    logger = get_logger(level=logging.getLevelName(args.log_level))
+
+    with FakeServices(options) as services, tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        os.makedirs("data", exist_ok=True)
+
+        # 将各依赖的地址指向替身服务, 并按需去掉固定的等待时间
+        LeiJing.base_url = f"{services.base_url}/leijing"
+        Cloud189.api_url = f"{services.base_url}/cloud/api"
+        Cloud189.auth_url = f"{services.base_url}/auth"
+        if not args.keep_sleeps:
+            LeiJing.page_sleep = 0
+            LeiJing.detail_sleep = (0, 0)
+            Cloud189Storage.save_wait = 0
+            JobQueue.retry_delay = (0, 0)
+            OpenAIParser.rate_limit_wait = 0
+
+        config = Config(
+            accounts=[AccountInfo(username=f"1390000{i:04d}", password="123456", root_folder="")
+                      for i in range(args.accounts)],
+            folder_rename_pattern="{title} ({year})",
+            file_rename_pattern="{title}.{year}",
+            api_url=f"{services.base_url}/llm/v1",
+            model="fake-model",
+            token="sk-benchmark",
+            cron="",
+            db_info=DBInfo(username="", password="", database=""),
+            parallel_saves=args.parallel,
+            tags=[str(tag) for tag in range(1, args.tags + 1)] if args.tags > 1 else [],
+            run_deadline=args.deadline
+        )
+
+        start = time.perf_counter()
+        collector = Collector(config, logger, Cloud189Storage, LeiJing, OpenAIParser, SQLiteFilter)
+        startup = time.perf_counter() - start
+        try:
+            # 多次运行时复用同一个收集器, 与常驻模式相同; 各阶段耗时为最后一次运行的结果
+            for _ in range(args.runs):
+                if args.backfill:
+                    collector.backfill((1, args.pages))
+                else:
+                    collector.collect((1, args.pages))
+        finally:
+            collector.close()
+        wall = time.perf_counter() - start
+
+        import sqlite3
+        saved = sqlite3.connect("data/movies.db").execute("select count(*) from movies").fetchone()[0]
+
+    return {
+        "options": vars(args),
+        "items": options.pages * options.items_per_page,
+        "saved": saved,
+        "wall_seconds": wall,
+        "startup_seconds": startup,
+        "items_per_second": saved / wall if wall else 0.0,
+        "stages": {stage: {"count": values["count"], "total": values["sum"], "mean": values["mean"],
+                           "max": values["max"], "cpu": values["cpu_seconds"]}
+                   for stage, values in METRICS.stages().items()},
+        "requests": dict(sorted(services.counts.items())),
+    }
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    def delta(current: float, previous: float) -> str:
+        if not previous:
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    base = baseline or {}
+    print(f"条目: {report['items']}, 成功保存: {report['saved']}")
+    print(f"总耗时: {report['wall_seconds']:.2f}s{delta(report['wall_seconds'], base.get('wall_seconds'))}, "
+          f"启动: {report['startup_seconds']:.2f}s")
+    print(f"吞吐量: {report['items_per_second']:.2f} 条/秒"
+          f"{delta(report['items_per_second'], base.get('items_per_second'))}")
+
+    print("各阶段耗时:")
+    base_stages = base.get("stages", {})
+    for stage, values in report["stages"].items():
+        previous = base_stages.get(stage, {}).get("total")
+        print(f"    {stage:<14} 次数 {values['count']:>5}  总计 {values['total']:8.3f}s{delta(values['total'], previous)}"
+              f"  平均 {values['mean'] * 1000:8.2f}ms  最大 {values['max'] * 1000:8.2f}ms  CPU {values['cpu']:7.3f}s")
+
+    print("请求次数:")
+    base_requests = base.get("requests", {})
+    for route, count in report["requests"].items():
+        previous = base_requests.get(route)
+        change = f" ({count - previous:+d})" if previous is not None and previous != count else ""
+        print(f"    {route:<36} {count:>6}{change}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="针对本地替身服务运行收集器基准测试")
+    parser.add_argument("--pages", type=int, default=5, help="列表页数量")
+    parser.add_argument("--items-per-page", type=int, default=20, help="每个列表页的详情页数量")
+    parser.add_argument("--accounts", type=int, default=1, help="天翼云盘账号数量")
+    parser.add_argument("--parallel", action="store_true", help="开启多账号并行转存")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="对话补全接口延迟（秒）")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每隔多少次对话补全请求返回一次 429")
+    parser.add_argument("--cloud-latency", type=float, default=0.0, help="天翼云盘接口延迟（秒）")
+    parser.add_argument("--unparseable-every", type=int, default=0, help="每隔多少个详情页有一个无法提取电影信息")
+    parser.add_argument("--dead-share-every", type=int, default=0, help="每隔多少个详情页有一个失效的分享链接")
+    parser.add_argument("--duplicate-every", type=int, default=0, help="每隔多少个详情页有一个与上一个详情页分享同一文件")
+    parser.add_argument("--save-error-every", type=int, default=0,
+                        help="每隔多少个分享第一次转存时返回 503, 转存失败的电影在下一次运行时重试")
+    parser.add_argument("--runs", type=int, default=1, help="连续运行次数, 请求次数为所有运行的合计")
+    parser.add_argument("--tags", type=int, default=1,
+                        help="并发爬取的标签数量, 各标签的帖子分享相同的文件, 用于测试多来源合并去重")
+    parser.add_argument("--deadline", type=int, default=0, help="每次运行的时间预算（秒）, 为0时不限制")
+    parser.add_argument("--backfill", action="store_true", help="以回填模式按分片逐页处理列表页")
+    parser.add_argument("--keep-sleeps", action="store_true", help="保留爬虫和转存中的固定等待时间")
+    parser.add_argument("--log-level", default="WARNING", help="日志等级")
+    parser.add_argument("--json", dest="json_path", help="将报告写入 JSON 文件")
+    parser.add_argument("--save-baseline", help="将报告保存为基线文件")
+    parser.add_argument("--baseline", help="与基线文件对比")
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    for path in (args.json_path, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
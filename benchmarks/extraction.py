@@ -0,0 +1,117 @@
+"""页面提取基准测试
+
+生成与雷鲸小站结构相同、包含导航、脚本、注释和侧边栏的列表页和详情页,
+对比原先先解码响应、构建完整 DOM 并执行未编译 XPath 的写法与 ``utils.extractor.PageExtractor`` 的
+单页耗时和文档树的节点数量（libxml2 的内存占用与节点数量成正比, tracemalloc 无法统计）.
+
+用法:
+    python -m benchmarks.extraction [--pages 500] [--sidebar 300]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from lxml import etree
+from requests import Response
+
+from crawlers.leijing import LeiJing
+from utils.extractor import PageExtractor, declared_encoding
+
+
+def noise(sidebar: int) -> str:
+    """生成与提取内容无关的页面部分"""
+    links = "\n".join(f'<li><a href="/thread?topicId={i}" title="推荐 {i}">推荐帖子 {i}</a><!-- item {i} --></li>'
+                      for i in range(sidebar))
+    script = "<script>var config = {" + ", ".join(f'"k{i}": {i}' for i in range(200)) + "};</script>"
+    return f'<div class="sidebar"><ul>{links}</ul></div>{script}<!-- footer -->'
+
+
+def listing_page(sidebar: int, items: int = 20) -> str:
+    rows = "\n".join(f'<div><div>cover</div><div><h2><a href="thread?topicId={i}">电影 {i}</a></h2>'
+                     f'<p>简介 {i}</p></div></div>' for i in range(items))
+    return (f'<html><head><title>列表</title>{noise(sidebar)}</head><body><div>header</div>'
+            f'<div><div><div>nav</div><div><div><div>{rows}</div></div></div>{noise(sidebar)}</div></div></body></html>')
+
+
+def detail_page(sidebar: int) -> str:
+    paragraphs = "\n".join(f"<p>第 {i} 段介绍</p>" for i in range(30))
+    return (f'<html><head><title>详情</title>{noise(sidebar)}</head><body><div>header</div><div><div><div><div>'
+            f'<div>title</div><div>meta</div><div><p>电影: 鬼滴语2</p><p>年份: 2024</p>'
+            f'<p>链接: https://cloud.189.cn/t/2uiM7zb6nuyi（访问码：kp0m）</p>{paragraphs}</div>'
+            f'</div></div></div>{noise(sidebar)}</div></body></html>')
+
+
+def make_response(text: str) -> Response:
+    response = Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    response.encoding = "utf-8"
+    response._content = text.encode("utf-8")
+    return response
+
+
+def inline_parse(response: Response):
+    return etree.HTML(response.text)
+
+
+def inline_listing(response: Response):
+    return inline_parse(response).xpath(LeiJing.selectors["detail_links"])
+
+
+def inline_content(response: Response):
+    nodes = inline_parse(response).xpath(LeiJing.selectors["content"])
+    return '\n'.join([s.strip() for s in nodes if s.strip()])
+
+
+def measure(fn: Callable[[Response], object], text: str, pages: int) -> Dict[str, float]:
+    """返回单页耗时的中位数（毫秒）和提取结果"""
+    fn(make_response(text))
+    latencies = []
+    for _ in range(pages):
+        # 每次使用新的响应对象, 与实际请求一样不复用已解码的文本
+        response = make_response(text)
+        start = time.perf_counter()
+        fn(response)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(latencies), "result": fn(make_response(text))}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="对比页面提取方式的耗时和文档树节点数量")
+    parser.add_argument("--pages", type=int, default=500, help="每种页面的提取次数")
+    parser.add_argument("--sidebar", type=int, default=300, help="页面中与提取内容无关的侧边栏链接数量")
+    args = parser.parse_args()
+
+    extractor = PageExtractor(LeiJing.selectors)
+
+    def compiled_parse(response: Response):
+        return extractor.parse(response.content, declared_encoding(response))
+
+    cases = {
+        "列表页": (listing_page(args.sidebar), inline_listing,
+                lambda response: extractor.values(compiled_parse(response), "detail_links")),
+        "详情页": (detail_page(args.sidebar), inline_content,
+                lambda response: extractor.text(compiled_parse(response), "content")),
+    }
+    for name, (text, inline, compiled) in cases.items():
+        before = measure(inline, text, args.pages)
+        after = measure(compiled, text, args.pages)
+        if before["result"] != after["result"]:
+            print(f"{name}: 提取结果不一致")
+            return 1
+        nodes_before = sum(1 for _ in inline_parse(make_response(text)).iter())
+        nodes_after = sum(1 for _ in compiled_parse(make_response(text)).iter())
+        print(f"{name} ({len(text) / 1024:.0f}KB)  原写法 {before['median_ms']:.3f}ms / {nodes_before} 个节点  "
+              f"选择器 {after['median_ms']:.3f}ms / {nodes_after} 个节点  "
+              f"耗时 {after['median_ms'] / before['median_ms'] - 1:+.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
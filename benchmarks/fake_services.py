@@ -0,0 +1,261 @@
+"""基准测试使用的本地替身服务
+
+在一个本地 HTTP 服务中同时模拟三类外部依赖, 按路径前缀区分:
+
+* ``/leijing``  雷鲸小站的列表页和详情页
+* ``/llm/v1``   OpenAI 兼容的对话补全接口, 支持设置延迟和注入 429 错误
+* ``/cloud/api`` 和 ``/auth`` 天翼云盘接口: 登录、分享信息、分享文件列表、批量任务、重命名和容量信息
+
+所有请求都会按路由计数, 便于在基准测试报告中对比请求次数.
+"""
+import base64
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import urlsplit, parse_qs
+
+LISTING_TEMPLATE = '''<html><body><div>header</div><div><div><div>nav</div><div><div><div>
+{items}
+</div></div></div></div></div></body></html>'''
+
+LISTING_ITEM = '''<div><div>cover</div><div><h2><a href="{href}">{title}</a></h2></div></div>'''
+
+DETAIL_TEMPLATE = '''<html><body><div>header</div><div><div><div><div><div>
+<div>title</div><div>meta</div>
+<div><p>电影: {title}</p><p>年份: {year}</p><p>链接: https://cloud.189.cn/t/{code}（访问码：{access}）</p></div>
+</div></div></div></div></div></body></html>'''
+
+# 不同标签的列表页中详情页ID的间隔, 详情页ID除以此数的余数相同的帖子分享同一文件（模拟转帖）
+TAG_OFFSET = 100000
+
+ANSWER = re.compile(r'电影: (.+?)\n年份: (\d{4})\n链接: (\S+)')
+
+
+@dataclass
+class FakeServiceOptions:
+    pages: int = 10  # 列表页数量
+    items_per_page: int = 20  # 每个列表页的详情页数量
+    llm_latency: float = 0.0  # 对话补全接口的延迟（秒）
+    llm_rate_limit_every: int = 0  # 每隔多少次对话补全请求返回一次 429, 为0时不注入
+    cloud_latency: float = 0.0  # 天翼云盘接口的延迟（秒）
+    unparseable_every: int = 0  # 每隔多少个详情页有一个无法提取电影信息, 为0时不注入
+    dead_share_every: int = 0  # 每隔多少个详情页有一个失效的分享链接, 为0时不注入
+    duplicate_every: int = 0  # 每隔多少个详情页有一个与上一个详情页分享同一文件, 为0时不注入
+    save_error_every: int = 0  # 每隔多少个分享第一次转存时返回 503, 为0时不注入
+    file_size: int = 2 * 1024 * 1024 * 1024  # 分享文件大小（字节）
+    free_size: int = 10 ** 15  # 每个账号的剩余空间（字节）
+
+
+class FakeServices:
+    """本地替身服务"""
+
+    def __init__(self, options: FakeServiceOptions = None):
+        self.options = options or FakeServiceOptions()
+        self.counts: Counter = Counter()
+        self.lock = threading.Lock()
+        self.llm_calls = 0
+        self.folder_seq = 0
+        self.folders: Dict[str, list] = {}  # 父文件夹ID -> 子文件夹列表, 用于遍历已转存的文件夹
+        self.failed_saves: set = set()  # 已返回过 503 的分享ID
+        self.public_key = self._generate_public_key()
+
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                services._handle(self, "GET", b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                services._handle(self, "POST", self.rfile.read(length))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @staticmethod
+    def _generate_public_key() -> str:
+        from Crypto.PublicKey import RSA
+
+        key = RSA.generate(1024)
+        return base64.b64encode(key.publickey().export_key(format="DER")).decode()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServices":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, route: str) -> None:
+        with self.lock:
+            self.counts[route] += 1
+
+    @staticmethod
+    def _send(handler, status: int, body, content_type: str = "application/json") -> None:
+        if not isinstance(body, (str, bytes)):
+            body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler, method: str, body: bytes) -> None:
+        parts = urlsplit(handler.path)
+        path = parts.path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if path.startswith("/leijing"):
+            self._leijing(handler, path[len("/leijing"):], query)
+        elif path.startswith("/llm/v1"):
+            self._llm(handler, path[len("/llm/v1"):], body)
+        elif path.startswith("/cloud/api") or path.startswith("/auth"):
+            form = parse_qs(body.decode("utf-8", errors="replace"))
+            query.update({key: values[-1] for key, values in form.items()})
+            self._cloud(handler, path, query)
+        else:
+            self._count("unknown")
+            self._send(handler, 404, {"error": "not found"})
+
+    def _leijing(self, handler, path: str, query: Dict[str, str]) -> None:
+        options = self.options
+        if path in ("", "/") and "tagId" in query:
+            self._count("leijing.listing")
+            page = int(query.get("page", 1))
+            offset = TAG_OFFSET * (int(query["tagId"]) % 10)
+            items = []
+            if page <= options.pages:
+                for i in range(options.items_per_page):
+                    index = (page - 1) * options.items_per_page + i
+                    items.append(LISTING_ITEM.format(href=f"thread?topicId={offset + index}", title=f"Movie {index}"))
+            self._send(handler, 200, LISTING_TEMPLATE.format(items="\n".join(items)), "text/html")
+        elif path == "/thread":
+            self._count("leijing.detail")
+            index = int(query["topicId"]) % TAG_OFFSET
+            html = DETAIL_TEMPLATE.format(title=f"Movie {index}", year=2000 + index % 25,
+                                          code=f"share{index}", access=f"{index % 10000:04d}")
+            self._send(handler, 200, html, "text/html")
+        else:
+            self._count("leijing.unknown")
+            self._send(handler, 404, "not found", "text/html")
+
+    def _llm(self, handler, path: str, body: bytes) -> None:
+        self._count("llm.chat_completions")
+        with self.lock:
+            self.llm_calls += 1
+            calls = self.llm_calls
+        if self.options.llm_latency:
+            time.sleep(self.options.llm_latency)
+        if self.options.llm_rate_limit_every and calls % self.options.llm_rate_limit_every == 0:
+            self._count("llm.rate_limited")
+            self._send(handler, 429, {"error": {"type": "rate_limit_exceeded", "message": "Rate limit reached"}})
+            return
+
+        messages = json.loads(body).get("messages", [])
+        match = ANSWER.search(messages[-1]["content"] if messages else "")
+        every = self.options.unparseable_every
+        if match and every and int(re.sub(r'\D', '', match.group(1))) % every == every - 1:
+            match = None
+        answer = f"{match.group(1)}, {match.group(2)}, {match.group(3)}" if match else "失败"
+        self._send(handler, 200, {
+            "choices": [{"message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": 400, "completion_tokens": 30, "total_tokens": 430}
+        })
+
+    def _cloud(self, handler, path: str, query: Dict[str, str]) -> None:
+        options = self.options
+        if options.cloud_latency:
+            time.sleep(options.cloud_latency)
+        route = path.rsplit("/", 1)[-1]
+        self._count(f"cloud.{route}")
+
+        if route == "loginUrl.action":
+            self._send(handler, 200, "<html>login</html>", "text/html")
+        elif route == "encryptConf.do":
+            self._send(handler, 200, {"data": {"pubKey": self.public_key, "pre": "{NRP}"}})
+        elif route == "appConf.do":
+            self._send(handler, 200, {"data": {"paramId": "fake-param"}})
+        elif route == "loginSubmit.do":
+            self._send(handler, 200, {"toUrl": f"{self.base_url}/auth/callback.do"})
+        elif route == "callback.do":
+            self._send(handler, 200, "<html>ok</html>", "text/html")
+        elif route == "getUserSizeInfo.action":
+            self._send(handler, 200, {"cloudCapacityInfo": {"freeSize": options.free_size}})
+        elif route == "createFolder.action":
+            with self.lock:
+                self.folder_seq += 1
+                folder_id = f"folder{self.folder_seq}"
+                # 用递增的修改时间保证遍历顺序稳定
+                last_op_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(1700000000 + self.folder_seq))
+                self.folders.setdefault(query.get("parentFolderId", ""), []).append(
+                    {"id": folder_id, "name": query.get("folderName", ""), "lastOpTime": last_op_time})
+            self._send(handler, 200, {"id": folder_id})
+        elif route == "getShareInfoByCodeV2.action":
+            code = query.get("shareCode", "")
+            index = re.sub(r'\D', '', code.split("（")[0]) or "0"
+            every = options.dead_share_every
+            if every and int(index) % every == every - 1:
+                self._send(handler, 400, {"res_code": "ShareNotFound", "res_message": "分享已失效"})
+                return
+            every = options.duplicate_every
+            if every and int(index) % every == every - 1:
+                index = str(int(index) - 1)
+            self._send(handler, 200, {
+                "fileId": f"root{index}", "isFolder": True, "fileSize": 0, "fileName": f"Movie {index}",
+                "accessCode": "", "shareId": f"shareid{index}", "shareMode": 1
+            })
+        elif route == "listShareDir.action":
+            file_id = query.get("fileId", "root0")
+            index = int(re.sub(r'\D', '', file_id) or 0)
+            self._send(handler, 200, {"fileListAO": {"fileList": [
+                {"id": f"{file_id}-sample", "name": "sample.mkv", "size": 50 * 1024 * 1024},
+                {"id": f"{file_id}-movie", "name": f"movie.{index}.mkv", "size": options.file_size + index},
+            ], "folderList": []}})
+        elif route == "createBatchTask.action":
+            share_id = query.get("shareId", "")
+            every = options.save_error_every
+            if every and int(re.sub(r'\D', '', share_id) or 0) % every == every - 1:
+                with self.lock:
+                    first = share_id not in self.failed_saves
+                    self.failed_saves.add(share_id)
+                if first:
+                    self._send(handler, 503, {"res_code": "ServiceUnavailable"})
+                    return
+            self._send(handler, 200, {"res_code": 0, "taskId": "task"})
+        elif route == "listFiles.action":
+            with self.lock:
+                folders = sorted(self.folders.get(query.get("folderId", ""), []),
+                                 key=lambda folder: folder["lastOpTime"], reverse=True)
+            if folders:
+                page_num, page_size = int(query.get("pageNum", 1)), int(query.get("pageSize", 60))
+                page = folders[(page_num - 1) * page_size:page_num * page_size]
+                self._send(handler, 200, {"fileListAO": {"fileList": [], "folderList": page, "count": len(folders)}})
+                return
+            self._send(handler, 200, {"fileListAO": {"fileList": [{"id": "saved-file", "name": "movie.mkv"}],
+                                                     "folderList": [], "count": 1}})
+        elif route == "renameFile.action":
+            self._send(handler, 200, {"res_code": 0})
+        else:
+            self._send(handler, 404, {"error": "not found"})
@@ -0,0 +1,142 @@
+"""并发过滤器压力测试
+
+多个生产者线程同时调用 ``filters.sqlite_concurrent.ConcurrentSQLiteFilter`` 写入电影（单条写入、批量写入、
+互相重复的批量写入）, 同时多个读者线程持续查询. 结束后检查写入的电影没有丢失或重复,
+并统计写入吞吐量、平均每个事务合并的写操作数量和写入期间的查询延迟.
+数据不一致或查询延迟 p99 超出预算时以非零状态码退出.
+
+用法:
+    python -m benchmarks.filter_stress [--producers 16] [--movies 500] [--readers 8] [--budget-ms 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from filters.sqlite_concurrent import ConcurrentSQLiteFilter
+from logger import get_logger
+from models.content import ContentInfo
+from models.movie_info import MovieInfo
+from utils.metrics import METRICS
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测试并发过滤器在多个生产者和读者下的一致性和延迟")
+    parser.add_argument("--producers", type=int, default=16, help="写入线程数量")
+    parser.add_argument("--movies", type=int, default=500, help="每个写入线程写入的电影数量")
+    parser.add_argument("--readers", type=int, default=8, help="查询线程数量")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="写入期间查询延迟 p99 预算（毫秒）")
+    args = parser.parse_args()
+
+    logger = get_logger(level="WARNING")
+    with tempfile.TemporaryDirectory() as workdir:
+        movie_filter = ConcurrentSQLiteFilter(None, logger, os.path.join(workdir, "movies.db"))
+        movie_filter.init_db()
+        METRICS.reset()
+
+        errors: List[BaseException] = []
+        latencies: List[float] = []
+        latencies_lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def produce(producer: int) -> None:
+            rng = random.Random(producer)
+            try:
+                for i in range(args.movies):
+                    movie = MovieInfo(title=f"电影 {producer}-{i}", year=2000 + i % 25, video_format="", edition="")
+                    if i % 10 == 0:
+                        # 所有生产者批量写入相同的电影, 只应新增一次
+                        shared = [(MovieInfo(title=f"共享电影 {i}", year=2020, video_format="", edition=""), "家庭云", f"user{producer}")]
+                        movie_filter.record_many(shared)
+                    if rng.random() < 0.5:
+                        content = ContentInfo(share_id=f"s{producer}-{i}", file_id=f"f{producer}-{i}",
+                                              file_size=i, file_name=f"{producer}-{i}.mkv")
+                        movie_filter.record(movie, "个人云", f"user{producer}", content)
+                    else:
+                        movie_filter.record_many([(movie, "个人云", f"user{producer}")])
+                    # 写方法返回后必须能查到刚写入的电影
+                    if not movie_filter.filter(movie):
+                        raise AssertionError(f"写入后查询不到: {movie}")
+            except BaseException as e:
+                errors.append(e)
+
+        def read(reader: int) -> None:
+            rng = random.Random(-reader - 1)
+            local = []
+            try:
+                while writing.is_set():
+                    movie = MovieInfo(title=f"电影 {rng.randrange(args.producers)}-{rng.randrange(args.movies)}",
+                                      year=rng.randint(2000, 2024), video_format="", edition="")
+                    start = time.perf_counter()
+                    movie_filter.filter(movie)
+                    movie_filter.filter_content(ContentInfo("", f"f{rng.randrange(1000)}", 0, ""))
+                    local.append((time.perf_counter() - start) * 1000)
+            except BaseException as e:
+                errors.append(e)
+            with latencies_lock:
+                latencies.extend(local)
+
+        readers = [threading.Thread(target=read, args=(i,)) for i in range(args.readers)]
+        producers = [threading.Thread(target=produce, args=(i,)) for i in range(args.producers)]
+        for thread in readers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in producers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        writes = METRICS.counter_value("filter_writes_total")
+        transactions = METRICS.counter_value("filter_write_transactions_total")
+        movie_filter.close()
+
+        import sqlite3
+        conn = sqlite3.connect(os.path.join(workdir, "movies.db"))
+        total = conn.execute("select count(*) from movies").fetchone()[0]
+        shared = conn.execute("select count(*) from movies where name like '共享电影%'").fetchone()[0]
+        duplicates = conn.execute("select count(*) from (select name, year from movies group by name, year "
+                                  "having count(*) > 1)").fetchone()[0]
+        conn.close()
+
+    expected_shared = len(range(0, args.movies, 10))
+    expected = args.producers * args.movies + expected_shared
+    print(f"写入: {int(writes)} 次写操作, {int(transactions)} 个事务 (平均每个事务 {writes / max(transactions, 1):.1f} 个), "
+          f"耗时 {elapsed:.2f}s, {writes / elapsed:.0f} 次/秒")
+    if latencies:
+        print(f"查询: {len(latencies)} 次, p50 {percentile(latencies, 0.5):.2f}ms  "
+              f"p99 {percentile(latencies, 0.99):.2f}ms  最大 {max(latencies):.2f}ms")
+    print(f"电影: {total} 部 (预期 {expected}), 共享电影 {shared} 部 (预期 {expected_shared}), 重复 {duplicates} 组")
+
+    failed = False
+    for error in errors[:5]:
+        print(f"错误: {error!r}")
+        failed = True
+    if total != expected or shared != expected_shared or duplicates:
+        print("数据不一致")
+        failed = True
+    if latencies and percentile(latencies, 0.99) > args.budget_ms:
+        print(f"查询延迟 p99 超出预算 {args.budget_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
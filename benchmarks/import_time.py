@@ -0,0 +1,95 @@
+"""启动耗时基准测试
+
+使用 ``python -X importtime`` 测量 ``main.py`` 的导入耗时, 并检查较重的依赖没有在启动时被导入.
+超出预算或导入了不应导入的模块时以非零状态码退出, 便于在 CI 中跟踪启动耗时的变化.
+
+用法:
+    python -m benchmarks.import_time [--runs 5] [--budget-ms 100]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 启动阶段不应导入的模块, 它们只在真正开始收集时才需要
+LAZY_MODULES = ["apscheduler", "toml", "colorlog", "requests", "lxml", "Crypto", "mysql", "collector"]
+
+SCENARIOS = {
+    # 只导入入口模块, 如等待 cron 触发前的状态
+    "import": "import main",
+    # 只检查配置文件
+    "load_config": "import main; main.load_config('data/config.toml')",
+}
+
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(code: str) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    """在新进程中执行代码并解析 -X importtime 的输出
+
+    Args:
+        code: 需要执行的代码
+
+    Returns:
+        Tuple: 各模块的 (自身耗时, 累计耗时) 微秒, 以及所有顶层导入的累计耗时之和
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules[name] = (self_us, cumulative_us)
+        # 缩进为一个空格的是顶层导入
+        if len(indent) == 1:
+            total += cumulative_us
+    return modules, total
+
+
+def lazy_violations(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    """返回启动阶段被提前导入的较重模块"""
+    return sorted({name for name in modules for lazy in LAZY_MODULES
+                   if name == lazy or name.startswith(f"{lazy}.")})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测量 main.py 的启动导入耗时")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景的运行次数, 取最小值")
+    parser.add_argument("--budget-ms", type=float, default=None, help="导入 main 的耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出累计耗时最多的模块数量")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, code in SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.runs)]
+        modules, total = min(runs, key=lambda run: run[1])
+        main_ms = modules.get("main", (0, 0))[1] / 1000
+        print(f"[{scenario}] main: {main_ms:.1f}ms, 全部导入: {total / 1000:.1f}ms (最少 {args.runs} 次)")
+
+        top = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        for name, (self_us, cumulative_us) in top:
+            print(f"    {cumulative_us / 1000:8.1f}ms  {self_us / 1000:8.1f}ms  {name}")
+
+        if scenario == "import":
+            violations = lazy_violations(modules)
+            if violations:
+                failed = True
+                print(f"启动时导入了应延迟导入的模块: {', '.join(violations)}")
+            if args.budget_ms is not None and main_ms > args.budget_ms:
+                failed = True
+                print(f"导入 main 耗时 {main_ms:.1f}ms, 超出预算 {args.budget_ms:.1f}ms")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
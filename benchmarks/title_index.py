@@ -0,0 +1,108 @@
+"""标题索引基准测试
+
+生成指定数量的随机中英文标题构建 ``utils.title.TitleIndex``, 测量构建耗时,
+以及完全相同、写法不同（空格、标点、全角、繁体、罗马数字）和不存在的标题的查询延迟.
+p99 超出预算时以非零状态码退出.
+
+用法:
+    python -m benchmarks.title_index [--titles 100000] [--queries 2000] [--budget-us 1000]
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.title import TitleIndex
+
+CHINESE = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+WORDS = ["the", "of", "night", "love", "war", "city", "last", "dark", "king", "dream", "lost", "star", "home", "river",
+         "ghost", "secret", "man", "woman", "story", "game", "blood", "fire", "road", "world", "summer", "winter"]
+SEQUELS = ["", "", "", " 2", " 3", " II", " III", "：续集"]
+
+
+def random_title(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        title = "".join(rng.choice(CHINESE) for _ in range(rng.randint(2, 6)))
+    else:
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+    return title + rng.choice(SEQUELS)
+
+
+def variant(title: str, rng: random.Random) -> str:
+    """生成同一标题的不同写法"""
+    changes: List[Callable[[str], str]] = [
+        lambda value: value.replace(" ", ""),
+        lambda value: value.replace(" ", "  ") + "!",
+        lambda value: value.upper(),
+        lambda value: re.sub(r'\bII\b', "2", value).replace("们", "們").replace("会", "會"),
+        lambda value: "".join(chr(ord(char) + 0xFEE0) if "!" <= char <= "~" else char for char in value),
+    ]
+    return rng.choice(changes)(title)
+
+
+def measure(index: TitleIndex, queries: List[Tuple[str, int]]) -> Tuple[List[float], int]:
+    """依次查询并返回每次查询的耗时（微秒）和命中数量"""
+    latencies = []
+    hits = 0
+    for title, year in queries:
+        start = time.perf_counter()
+        found = index.find(title, year)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hits += found is not None
+    return latencies, hits
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测量标题索引的构建耗时和查询延迟")
+    parser.add_argument("--titles", type=int, default=100000, help="索引中的标题数量")
+    parser.add_argument("--queries", type=int, default=2000, help="每类查询的数量")
+    parser.add_argument("--budget-us", type=float, default=1000.0, help="查询延迟 p99 预算（微秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    library = [(random_title(rng), rng.randint(1950, 2025)) for _ in range(args.titles)]
+
+    index = TitleIndex()
+    start = time.perf_counter()
+    for title, year in library:
+        index.add(title, year)
+    build = time.perf_counter() - start
+    print(f"构建: {len(index)} 个标题, 耗时 {build:.2f}s")
+
+    samples = rng.sample(library, min(args.queries, len(library)))
+    scenarios = {
+        "相同标题": samples,
+        "不同写法": [(variant(title, rng), year) for title, year in samples],
+        "不存在": [(random_title(rng) + " " + rng.choice(WORDS), rng.randint(1950, 2025))
+                for _ in range(args.queries)],
+    }
+
+    worst = 0.0
+    for name, queries in scenarios.items():
+        latencies, hits = measure(index, queries)
+        p99 = percentile(latencies, 0.99)
+        worst = max(worst, p99)
+        print(f"{name:<8} 命中 {hits:>5}/{len(queries):<5} p50 {statistics.median(latencies):7.1f}us  "
+              f"p99 {p99:7.1f}us  最大 {max(latencies):8.1f}us")
+
+    if worst > args.budget_us:
+        print(f"查询延迟 p99 {worst:.1f}us 超出预算 {args.budget_us:.0f}us")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
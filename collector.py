@@ -1,93 +1,955 @@
+import hashlib
+import heapq
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import replace
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
 from models.config import Config
-from typing import Tuple, Any
+from models.job import Job, DISCOVERED, PARSED, SAVED, RENAMED, RECORDED, SKIPPED, FAILED
+from typing import Callable, Tuple, Iterable, Iterator, Optional, Dict, List
+
+from utils.circuit_breaker import CircuitOpenError, breaker_states, check_breakers, find_open_circuit
+from utils.failure_cache import FailureCache
+from utils.job_queue import JobQueue
+from utils.metrics import METRICS
+from utils.run_history import build_run_record
+from utils.status_server import register_status, unregister_status
 
 
 class Collector:
+    # 并发预检分享链接的线程数
+    share_check_workers = 4
+    # 调用大模型解析之前最多提前请求的详情页数量, 提前请求的详情页在后台预检分享链接
+    fetch_ahead = 4
+    # 回填时每个分片的列表页数量, 分片中的任务处理完后才爬取下一个分片
+    backfill_shard_pages = 5
+    # 常规运行时遇到没有变化的列表页是否停止翻页
+    stop_on_known_page = True
+    # 设置运行时间预算但没有历史运行报告时, 估算的每个任务耗时（秒）
+    default_item_cost = 10.0
+    # 本次运行完成多少个任务后改用本次运行的实际平均耗时
+    cost_sample_items = 3
+    # 转存当前电影时, 提前为之后多少部电影创建文件夹, 为0时不预取; 多账号并行转存时不使用
+    prefetch_items = 2
+
     def __init__(self, config: Config, logger, storage, crawler, parser, filter):
         """初始化收集器
-        
+
         Args:
             config: 配置对象
             logger: 日志记录器
             storage: 存储类
-            crawler: 爬虫类
+            crawler: 爬虫类, 或多个爬虫类组成的列表, 各来源并发爬取列表页后合并去重
             parser: 解析器类
             filter: 过滤器类
         """
         self.config = config
         self.logger = logger
         self.storage = storage(self.config, logger)
-        self.crawler = crawler(self.config, parser, logger)
+        crawler_classes = crawler if isinstance(crawler, (list, tuple)) else [crawler]
+        self.crawlers = [instance for crawler_class in crawler_classes
+                         for instance in crawler_class.from_config(self.config, parser, logger)]
+        self.crawler = self.crawlers[0]
         self.filter = filter(self.config, logger)
         self.filter.init_db()
+        self.jobs = JobQueue(logger)
+
+        # 失败记录: 近期失败的详情页和分享链接在屏蔽期内直接跳过
+        self.failures = FailureCache(logger)
+        for instance in self.crawlers:
+            instance.failures = self.failures
+        self.storage.failures = self.failures
+
+        # 多账号并行转存时, 每个账号使用独立登录的存储对象和工作线程
+        self.dispatcher = None
+        if config.parallel_saves and len(config.accounts) > 1:
+            from utils.dispatcher import SaveDispatcher
+            storages = [storage(replace(self.config, accounts=[account]), logger) for account in self.config.accounts]
+            for account_storage in storages:
+                account_storage.failures = self.failures
+                account_storage.abort_when_all_open = False
+            self.dispatcher = SaveDispatcher(storages, logger)
+
+        # 预检时已解析的分享信息, 转存时直接使用, 不再重复查询
+        self.shares: Dict[str, object] = {}
+        # 单账号转存时, 在后台为即将转存的电影提前创建文件夹
+        self.prefetcher = None
+        if self.dispatcher is None and self.prefetch_items > 0:
+            self.prefetcher = ThreadPoolExecutor(max_workers=self.prefetch_items, thread_name_prefix="prefetch")
+        # 预先创建的文件夹, 结果为 (账号, 文件夹ID)
+        self.folders: Dict[str, Future] = {}
+        # 并行转存中遇到的熔断异常, 由主线程在收集结果后抛出
+        self.open_circuit: Optional[CircuitOpenError] = None
+
+        # 已完成的运行次数, 常驻模式下同一个收集器会被多次运行
+        self.runs = 0
+        # 各任务开始处理的时间, 以及本次运行中耗时最长的任务
+        self.item_started: Dict[str, float] = {}
+        self.item_seconds: List[float] = []
+        # 运行时间预算, 由每次运行开始时按配置设置
+        self.deadline: Optional[float] = None
+        self.deadline_reached = False
+        self.item_cost = self.default_item_cost
+        self.items_finished = 0
+        self.run_started = 0.0
+        self.slowest_items: List[Tuple[float, str, str]] = []
+        # 运行状态, 由状态服务读取
+        self.running = False
+        self.started_at: Optional[float] = None
+        self.last_progress_at: Optional[float] = None
+        self.last_run: Optional[dict] = None
+        register_status("collector", self.status)
+
+    def _fetch_job(self, job: Job) -> Optional[str]:
+        """请求任务对应的详情页
+
+        Args:
+            job: discovered 状态的任务
+
+        Returns:
+            Optional[str]: 详情页正文, 失败时返回None
+        """
+        try:
+            text = self._crawler_for(job.url).fetch_detail(job.url)
+        except Exception as e:
+            self._raise_if_circuit_open(e)
+            self.logger.error(f"处理详情页异常: {job.url}, 错误: {e}")
+            text = None
+
+        if text is None:
+            self.jobs.update(job, FAILED, error="获取详情页失败")
+            self._finish_item(job, "parse_failed")
+        return text
+
+    def _crawler_for(self, url: str):
+        """按站点找到负责详情页的爬虫, 同一站点的多个来源（如不同标签）使用第一个"""
+        host = urlsplit(url).netloc
+        for crawler in self.crawlers:
+            if urlsplit(crawler.source).netloc == host:
+                return crawler
+        return self.crawler
+
+    def _crawl_sources(self, crawl: Callable) -> List[Tuple[object, object]]:
+        """对每个来源并发执行爬取函数, 单个来源失败时记录错误并继续处理其他来源
+
+        Args:
+            crawl: 以爬虫为参数的爬取函数
+
+        Returns:
+            List[Tuple]: 按来源顺序排列的 (爬虫, 爬取结果), 不包含失败的来源
+
+        Raises:
+            CircuitOpenError: 依赖服务已熔断
+        """
+        if len(self.crawlers) == 1:
+            return [(self.crawler, crawl(self.crawler))]
+        results = []
+        with ThreadPoolExecutor(max_workers=len(self.crawlers), thread_name_prefix="crawl") as executor:
+            futures = [(crawler, executor.submit(crawl, crawler)) for crawler in self.crawlers]
+            for crawler, future in futures:
+                try:
+                    results.append((crawler, future.result()))
+                except Exception as e:
+                    self._raise_if_circuit_open(e)
+                    self.logger.error(f"爬取来源失败: {crawler.source}, 错误: {e}")
+        return results
+
+    def _check_share(self, share_link: Optional[str]):
+        """解析详情页中的分享链接, 在调用大模型之前排除失效的分享
+
+        Args:
+            share_link: 从详情页正文中找到的分享链接, 没有找到时为None
+
+        Returns:
+            分享信息, 正文中没有分享链接时返回None
+
+        Raises:
+            Exception: 分享链接失效或近期处理失败
+        """
+        if share_link is None:
+            METRICS.inc("share_checks_total", result="not_found")
+            return None
+        try:
+            share = self.storage.resolve_share(share_link)
+        except Exception:
+            METRICS.inc("share_checks_total", result="dead")
+            raise
+        METRICS.inc("share_checks_total", result="live")
+        return share
+
+    def _parse_job(self, job: Job, text: str, check: Future) -> Optional[Job]:
+        """等待分享链接预检完成, 分享有效时调用大模型解析详情页
+
+        Args:
+            job: discovered 状态的任务
+            text: 详情页正文
+            check: 分享链接预检结果
+
+        Returns:
+            Optional[Job]: 解析成功时返回 parsed 状态的任务, 否则返回None
+        """
+        try:
+            share = check.result()
+        except Exception as e:
+            self._raise_if_circuit_open(e)
+            details = getattr(e, "details", None)
+            if isinstance(details, dict) and details.get("failure"):
+                self._fail_movie(job, e)
+                return None
+            # 网络异常等无法确定分享是否有效时, 仍然交给大模型解析, 转存时再次检查
+            self.logger.warning(f"预检分享链接失败: {job.url}, 错误: {e}")
+            share = None
+
+        try:
+            result = self._crawler_for(job.url).extract(job.url, text)
+        except Exception as e:
+            self._raise_if_circuit_open(e)
+            self.logger.error(f"处理详情页异常: {job.url}, 错误: {e}")
+            result = None
+
+        if not result:
+            self.jobs.update(job, FAILED, error="解析失败")
+            self._finish_item(job, "parse_failed")
+            return None
+
+        movie_info, share_link = result
+        if share is not None:
+            self.shares[job.url] = share
+        return self.jobs.update(job, PARSED, movie_info=movie_info, share_link=share_link)
+
+    def _iter_pending(self, seen: set, discovered: List[Job]) -> Iterator[Job]:
+        """产出从检查点恢复的任务, discovered 状态的任务加入 discovered 列表, 与新发现的详情页一起解析
+
+        Args:
+            seen: 已产出的详情页链接
+            discovered: 待解析的任务列表
+
+        Yields:
+            Job: 已解析的任务
+        """
+        pending = self.jobs.pending()
+        if pending:
+            self.logger.info(f"从检查点恢复 {len(pending)} 个未完成的任务")
+        waiting = self.jobs.waiting()
+        if waiting:
+            self.logger.info(f"{waiting} 个转存失败的任务尚未到重试时间")
+        for job in pending:
+            seen.add(job.url)
+            self.item_started[job.url] = time.perf_counter()
+            if job.state == DISCOVERED:
+                discovered.append(job)
+            else:
+                yield job
+
+    def _iter_jobs(self, num: Tuple[int, int]) -> Iterator[Job]:
+        """依次产出待处理的任务, 先从检查点恢复上次未完成的任务, 再爬取新的详情页
 
-    def _process_movie(self, movie_info: Any, file_link: str) -> bool:
-        """处理单个电影信息
-        
         Args:
-            movie_info: 电影信息对象
-            file_link: 文件链接
-            
+            num: 页码范围元组 (start, end)
+
+        Yields:
+            Job: 已解析的任务
+        """
+        seen = set()
+        discovered: List[Job] = []
+        yield from self._iter_pending(seen, discovered)
+
+        self.logger.info(f"开始爬取第{num[0]}页到第{num[1]}页的电影信息")
+        total_urls = []
+        listings = []
+        for crawler, (urls, fingerprints) in self._crawl_sources(lambda crawler: self._list_source(crawler, num)):
+            if len(self.crawlers) > 1:
+                self.logger.info(f"来源 {crawler.source} 获取到{len(urls)}个电影详情页链接")
+            total_urls.extend(urls)
+            listings.extend(fingerprints)
+        self.logger.info(f"共获取到{len(total_urls)}个电影详情页链接")
+        yield from self._parse_urls(total_urls, seen, discovered, listings)
+
+    def _list_source(self, crawler, num: Tuple[int, int]) -> Tuple[List[str], List[Tuple[str, int, str]]]:
+        """逐页爬取一个来源的列表页, 遇到没有变化的列表页时停止翻页
+
+        列表页中的详情页都已处理过, 或详情页链接的顺序与上次爬取时完全相同时, 说明之后的列表页也都已处理过,
+        不再请求之后的列表页; 该页中只重试之前失败且不在屏蔽期内的详情页.
+
+        Args:
+            crawler: 爬虫
+            num: 页码范围元组 (start, end)
+
+        Returns:
+            Tuple[List[str], List[Tuple[str, int, str]]]: 需要处理的详情页链接, 以及有变化的列表页的
+                (来源, 页码, 指纹), 指纹在详情页登记为任务时才保存
+        """
+        total_urls = []
+        listings = []
+        for page, urls in crawler.iter_detail_pages(num[0], num[1]):
+            fingerprint = hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()
+            unchanged = self.jobs.listing_unchanged(crawler.source, page, fingerprint)
+            if not unchanged:
+                listings.append((crawler.source, page, fingerprint))
+            unknown = [url for url in urls if not self._is_known(url)]
+            if self.stop_on_known_page and urls and (unchanged or not unknown):
+                METRICS.inc("listing_pages_unchanged_total")
+                self.logger.info(f"第{page}页没有新的详情页, 停止翻页: {crawler.source}")
+                total_urls.extend(unknown)
+                break
+            total_urls.extend(url for url in urls if not crawler.is_blocked(url))
+        return total_urls, listings
+
+    def _is_known(self, url: str) -> bool:
+        """详情页已登记为任务（失败的除外）, 或近期失败仍在屏蔽期内"""
+        job = self.jobs.get(url)
+        if job is not None and job.state != FAILED:
+            return True
+        return self.failures.blocked(url) is not None
+
+    def _iter_backfill(self, num: Tuple[int, int], shard_pages: int) -> Iterator[Job]:
+        """按分片逐页爬取并处理大范围的列表页, 内存占用与页码范围无关
+
+        每个分片包含 shard_pages 个列表页, 分片中的任务全部处理完后才爬取下一个分片,
+        并将分片中的列表页记录为已完成, 中断后再次回填时跳过已完成的列表页.
+        新帖子只会把旧帖子推向更靠后的页码, 按页码从小到大回填时不会遗漏.
+
+        Args:
+            num: 页码范围元组 (start, end)
+            shard_pages: 每个分片的列表页数量
+
+        Yields:
+            Job: 已解析的任务
+        """
+        seen = set()
+        discovered: List[Job] = []
+        yield from self._iter_pending(seen, discovered)
+        yield from self._parse_urls([], seen, discovered)
+
+        start, end = num
+        total_pages = (end - start + 1) * len(self.crawlers)
+        done_pages = sum(self.jobs.page_finished(crawler.source, page)
+                         for crawler in self.crawlers for page in range(start, end + 1))
+        self.logger.info(f"开始回填第{start}页到第{end}页, 共 {total_pages} 页, 已完成 {done_pages} 页")
+        started = time.perf_counter()
+        pages_this_run = 0
+        for shard_start in range(start, end + 1, shard_pages):
+            # 剩余时间不足时不再爬取之后的分片, 下次回填时从第一个未完成的列表页继续
+            if not self._has_time_for(1):
+                return
+            shard = range(shard_start, min(shard_start + shard_pages, end + 1))
+
+            def crawl_shard(crawler) -> Dict[int, List[str]]:
+                return {page: crawler.get_detail_page(page, page) for page in shard
+                        if not self.jobs.page_finished(crawler.source, page)}
+
+            crawled = [(crawler, page_urls) for crawler, page_urls in self._crawl_sources(crawl_shard) if page_urls]
+            if not crawled:
+                continue
+            yield from self._parse_urls([url for _, page_urls in crawled for urls in page_urls.values() for url in urls],
+                                        set(), [])
+            # 分片中的任务因时间不足没有全部处理时不记录为已完成, 已登记的任务下次运行时从检查点继续
+            if self.deadline_reached:
+                return
+
+            pages = 0
+            for crawler, page_urls in crawled:
+                for page, urls in page_urls.items():
+                    self.jobs.finish_page(crawler.source, page, len(urls))
+                pages += len(page_urls)
+            METRICS.inc("backfill_pages_total", pages)
+            done_pages += pages
+            pages_this_run += pages
+            self._log_backfill_progress(done_pages, total_pages, pages_this_run, time.perf_counter() - started)
+
+    def _log_backfill_progress(self, done_pages: int, total_pages: int, pages_this_run: int, elapsed: float) -> None:
+        """按本次运行的速度估算剩余时间并输出回填进度"""
+        rate = pages_this_run / elapsed if elapsed > 0 else 0.0
+        remaining = (total_pages - done_pages) / rate if rate > 0 else 0.0
+        self.logger.info(f"回填进度: {done_pages}/{total_pages} 页 ({done_pages / total_pages:.1%}), "
+                         f"速度 {rate * 60:.1f} 页/分钟, 预计剩余 {timedelta(seconds=int(remaining))}")
+
+    def _parse_urls(self, urls: List[str], seen: set, discovered: List[Job],
+                    listings: Iterable[Tuple[str, int, str]] = ()) -> Iterator[Job]:
+        """登记新发现的详情页, 与已有的 discovered 任务一起请求详情页、预检分享链接并调用大模型解析
+
+        Args:
+            urls: 详情页链接列表
+            seen: 已产出的详情页链接
+            discovered: 从检查点恢复的 discovered 任务
+            listings: 与详情页在同一个事务中保存的列表页指纹 (来源, 页码, 指纹)
+
+        Yields:
+            Job: 已解析的任务
+        """
+        new_urls = []
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+
+            # 已处理完毕的详情页无需再次调用大模型
+            job = self.jobs.get(url)
+            if job is not None and job.state != FAILED:
+                self.logger.debug("详情页已处理, 跳过: %s", url)
+                continue
+
+            self.item_started[url] = time.perf_counter()
+            new_urls.append(url)
+        discovered.extend(self.jobs.discover(new_urls, listings))
+
+        # 请求详情页并在后台并发预检分享链接, 提前请求的详情页达到 fetch_ahead 个后, 只对分享有效的最早一个
+        # 调用大模型并产出, 之后再请求下一个详情页; 不同来源或不同帖子分享同一链接时只解析第一个
+        fetched: deque = deque()
+        share_links: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=self.share_check_workers, thread_name_prefix="share-check") as executor:
+            for index, job in enumerate(discovered, 1):
+                # 剩余时间不足以处理更多任务时, 之后的任务保持 discovered 状态, 下次运行时继续
+                if not self._has_time_for(len(fetched) + 1):
+                    break
+                self.logger.debug("开始处理第%d/%d个链接: %s", index, len(discovered), job.url)
+                text = self._fetch_job(job)
+                if text is None:
+                    continue
+                share_link = self.storage.find_share_link(text)
+                if share_link is not None and share_link in share_links:
+                    self.logger.info(f"分享链接与 {share_links[share_link]} 相同, 跳过: {job.url}")
+                    METRICS.inc("share_duplicates_total")
+                    self._skip_movie(job)
+                    continue
+                if share_link is not None:
+                    share_links[share_link] = job.url
+                fetched.append((job, text, executor.submit(self._check_share, share_link)))
+                if len(fetched) > self.fetch_ahead:
+                    job = self._parse_job(*fetched.popleft())
+                    if job is not None:
+                        yield job
+
+            while fetched:
+                if not self._has_time_for(1):
+                    break
+                job = self._parse_job(*fetched.popleft())
+                if job is not None:
+                    yield job
+
+    def _save_movie(self, storage, job: Job, share=None) -> None:
+        """转存并重命名电影, 从任务当前所处的状态继续执行
+
+        Args:
+            storage: 存储对象
+            job: 任务
+            share: 预先解析好的分享信息, 为None时先解析分享链接
+        """
+        folder_name = self.config.folder_rename_pattern.format(**job.movie_info.__dict__)
+        file_name = self.config.file_rename_pattern.format(**job.movie_info.__dict__)
+
+        # 先解析分享链接, 分享失效时不会留下空文件夹; 再选定空间充足的账号, 在该账号下创建文件夹并保存文件.
+        # 文件夹创建后立即记录到任务中, 重试或下次运行时继续使用; 文件夹属于其他账号时重新创建
+        if job.state == PARSED:
+            if share is None:
+                share = storage.resolve_share(job.share_link)
+            account_id = storage.select_account(share)
+            if job.folder_id is None or job.account_id != account_id:
+                if job.folder_id is not None:
+                    self.logger.info(f"文件夹属于账号 {job.account_id}, 在账号 {account_id} 下重新创建: {folder_name}")
+                with METRICS.timer("create_folder"):
+                    folder_id = storage.create_folder(folder_name, account_id=account_id)
+                self.jobs.update(job, PARSED, folder_id=folder_id, account_id=account_id)
+            with METRICS.timer("save"):
+                file_ext, file_id = storage.save(job.folder_id, file_name, share)
+            account_type, account_id = storage.get_current_account_info()
+            self.jobs.update(job, SAVED, file_ext=file_ext, file_id=file_id, account_id=account_id)
+        else:
+            # 从检查点恢复时回到转存时使用的账号
+            storage.switch_account(job.account_id)
+
+        # 等待保存完成并重命名
+        if job.state == SAVED:
+            with METRICS.timer("wait"):
+                storage.wait_until_save_complete(file_name, job.folder_id)
+            with METRICS.timer("rename"):
+                storage.rename(f"{file_name}.{job.file_ext}", job.folder_id, job.file_id)
+            self.jobs.update(job, RENAMED)
+
+    def _record_movie(self, job: Job) -> None:
+        """记录已保存的电影, 以及转存的文件用于按内容去重"""
+        share = self.shares.pop(job.url, None)
+        if job.state == RENAMED:
+            account_type, _ = self.storage.get_current_account_info()
+            content = share.content if share is not None else None
+            with METRICS.timer("record"):
+                self.filter.record(job.movie_info, account_type, job.account_id, content)
+            self.jobs.update(job, RECORDED)
+            self.failures.clear(job.url)
+        self._finish_item(job, "processed")
+        self.logger.info(f"成功保存 {job.movie_info}")
+
+    @staticmethod
+    def _raise_if_circuit_open(error: Exception) -> None:
+        """依赖服务已熔断时终止本次运行, 任务保持当前状态, 不标记为失败; 单个账号熔断时由调用方继续处理"""
+        circuit = find_open_circuit(error)
+        if circuit is not None and circuit.critical:
+            raise circuit
+
+    def _fail_movie(self, job: Job, error: Exception) -> None:
+        """处理转存失败的任务
+
+        存储在异常中标注了失败类型（如分享链接失效、空间不足）时, 将任务标记为 failed 并记录详情页,
+        屏蔽期内不再重复请求详情页和调用大模型. 其他错误（如网盘接口 5xx、超时、转存后重命名时文件尚未出现）
+        视为临时错误, 任务保持当前状态并按指数退避安排重试, 下次运行时先于爬取新页面从检查点继续,
+        不会重新请求详情页和调用大模型; 达到最多尝试次数后标记为 failed.
+
+        转存使用的账号已熔断时, 任务保持当前状态, 不计入尝试次数, 下次运行时从检查点继续, 之后的任务由其他账号转存.
+
+        Args:
+            job: 任务
+            error: 异常
+        """
+        self.shares.pop(job.url, None)
+        circuit = find_open_circuit(error)
+        if circuit is not None:
+            self.logger.warning(f"{circuit}, 下次运行时继续处理: {job.movie_info or job.url}")
+            self._finish_item(job, "deferred")
+            return
+        self.logger.error(f"处理电影 {job.movie_info or job.url} 时出错: {error}")
+        details = getattr(error, "details", None)
+        failure = details.get("failure") if isinstance(details, dict) else None
+        if not failure and job.movie_info is not None:
+            delay = self.jobs.retry(job, str(error))
+            if delay is not None:
+                self.logger.info(f"{delay / 60:.0f}分钟后第{job.attempts + 1}次尝试转存: {job.movie_info}")
+                self._finish_item(job, "retrying")
+                return
+        self.jobs.update(job, FAILED, error=str(error))
+        if failure:
+            self.failures.record(job.url, failure, str(error))
+        self._finish_item(job, "failed")
+
+    def _prefetch_folder(self, job: Job) -> None:
+        """在后台为已通过去重检查的电影在当前账号下创建文件夹, 与正在进行的转存并行
+
+        账号在提交时确定并显式传给存储, 主线程之后切换账号时文件夹仍创建在该账号自己的电影文件夹下.
+        """
+        if job.folder_id is not None:
+            return
+        folder_name = self.config.folder_rename_pattern.format(**job.movie_info.__dict__)
+        _, account_id = self.storage.get_current_account_info()
+
+        def create_folder() -> Tuple[str, str]:
+            with METRICS.timer("create_folder"):
+                return account_id, self.storage.create_folder(folder_name, account_id=account_id)
+
+        self.folders[job.url] = self.prefetcher.submit(create_folder)
+
+    def _take_prefetched_folder(self, job: Job) -> None:
+        """等待预先创建的文件夹, 并与所属账号一起记录到任务中; 创建失败时由转存时重新创建"""
+        future = self.folders.pop(job.url, None)
+        if future is None:
+            return
+        try:
+            account_id, folder_id = future.result()
+        except Exception as e:
+            self.logger.debug("预先创建文件夹失败, 转存时重新创建: %s", e)
+            return
+        self.jobs.update(job, PARSED, folder_id=folder_id, account_id=account_id)
+
+    def _process_movie(self, job: Job) -> bool:
+        """处理单个电影信息, 从任务当前所处的状态继续执行
+
+        Args:
+            job: 任务
+
         Returns:
             bool: 处理是否成功
         """
         try:
-            folder_name = self.config.folder_rename_pattern.format(**movie_info.__dict__)
-            file_name = self.config.file_rename_pattern.format(**movie_info.__dict__)
-            
-            # 创建文件夹并保存文件
-            folder_id = self.storage.create_folder(folder_name)
-            file_ext, file_id = self.storage.save(folder_id, file_name, file_link)
-            
-            # 等待保存完成并重命名
-            self.storage.wait_until_save_complete(file_name, folder_id)
-            self.storage.rename(f"{file_name}.{file_ext}", folder_id, file_id)
-            
-            # 记录已保存的电影
-            account_type, account_id = self.storage.get_current_account_info()
-            self.filter.record(movie_info, account_type, account_id)
-            
-            self.logger.info(f"成功保存 {movie_info}")
+            self._take_prefetched_folder(job)
+            self._save_movie(self.storage, job, self.shares.get(job.url))
+            self._record_movie(job)
             return True
         except Exception as e:
-            self.logger.error(f"处理电影 {movie_info} 时出错: {e}")
+            self._raise_if_circuit_open(e)
+            self._fail_movie(job, e)
             return False
 
+    def _dispatch_movie(self, job: Job) -> Future | None:
+        """将已解析分享链接的任务分配给剩余空间充足的账号并行转存
+
+        Args:
+            job: parsed 状态的任务
+
+        Returns:
+            Future | None: 转存结果, 分配失败时返回None
+        """
+        try:
+            share = self.shares[job.url]
+            return self.dispatcher.submit(share.file.fileSize, self._save_movie, job, share)
+        except Exception as e:
+            self._raise_if_circuit_open(e)
+            self._fail_movie(job, e)
+            return None
+
+    def _resolve_share(self, job: Job):
+        """解析任务的分享链接, 预检时已解析的直接使用
+
+        Args:
+            job: parsed 状态的任务
+
+        Returns:
+            分享信息, 解析失败时将任务标记为 failed 并返回None
+        """
+        share = self.shares.get(job.url)
+        if share is not None:
+            return share
+        try:
+            share = self.storage.resolve_share(job.share_link)
+        except Exception as e:
+            self._raise_if_circuit_open(e)
+            self._fail_movie(job, e)
+            return None
+        self.shares[job.url] = share
+        return share
+
+    def _movie_exists(self, job: Job, inflight: List[Job]) -> bool:
+        """按标题和年份判断电影是否已存在, 包括正在并行转存和等待转存的电影"""
+        with METRICS.timer("filter"):
+            exists = (self.filter.filter(job.movie_info)
+                      or any(job.movie_info == other.movie_info for other in inflight))
+        if exists:
+            self.logger.info(f"跳过已存在的电影: {job.movie_info}")
+        return exists
+
+    def _content_exists(self, job: Job, share, inflight: List[Job]) -> bool:
+        """按分享中的文件判断是否已经转存过, 不同帖子分享的同一文件或大模型返回的标题不同时也能识别"""
+        content = share.content
+        shares = [self.shares.get(other.url) for other in inflight]
+        with METRICS.timer("filter"):
+            exists = (self.filter.filter_content(content)
+                      or any(other is not None and other.content.file_id == content.file_id for other in shares))
+        if exists:
+            self.logger.info(f"跳过已转存过的文件: {job.movie_info}, 文件: {content.file_name}")
+            METRICS.inc("content_duplicates_total")
+        return exists
+
+    def _skip_movie(self, job: Job) -> None:
+        """将已存在的电影标记为 skipped"""
+        self.jobs.update(job, SKIPPED)
+        self.shares.pop(job.url, None)
+        self._finish_item(job, "skipped")
+
+    def _start_movie(self, job: Job, futures: Dict[Future, Job]) -> None:
+        """转存电影, 多账号并行转存时分配给账号后立即返回, 并收集已完成的并行转存结果
+
+        Args:
+            job: 任务
+            futures: 进行中的转存任务
+
+        Raises:
+            CircuitOpenError: 依赖服务已熔断
+        """
+        if self.dispatcher is not None and job.state == PARSED:
+            future = self._dispatch_movie(job)
+            if future is not None:
+                futures[future] = job
+        else:
+            self._process_movie(job)
+
+        if futures:
+            self._drain(futures)
+        if self.open_circuit is not None:
+            raise self.open_circuit
+
+    def _drain(self, futures: Dict[Future, Job], wait_all: bool = False) -> None:
+        """收集已完成的并行转存结果, 并在主线程中记录已保存的电影
+
+        Args:
+            futures: 进行中的转存任务
+            wait_all: 是否等待所有任务完成
+        """
+        if wait_all:
+            wait(futures)
+        for future in [future for future in futures if future.done()]:
+            job = futures.pop(future)
+            try:
+                future.result()
+                self._record_movie(job)
+            except Exception as e:
+                # 依赖服务熔断时任务保持当前状态, 下次运行从检查点继续; 单个账号熔断时由 _fail_movie 处理
+                circuit = find_open_circuit(e)
+                if circuit is not None and circuit.critical:
+                    self.open_circuit = self.open_circuit or circuit
+                    continue
+                self._fail_movie(job, e)
+
+    @staticmethod
+    def _result_counts() -> Dict[str, int]:
+        """按 _finish_item 记录的处理结果汇总成功、跳过和失败数量, 获取或解析失败和等待重试的任务计为失败"""
+        items = METRICS.counter_by("items_total", "result")
+        processed = int(items.get("processed", 0))
+        skipped = int(items.get("skipped", 0))
+        return {"processed": processed, "skipped": skipped, "failed": int(sum(items.values())) - processed - skipped}
+
+    def _finish_item(self, job: Job, result: str) -> None:
+        """记录单个任务的处理结果和总耗时
+
+        Args:
+            job: 任务
+            result: 处理结果, 如 processed、skipped、failed、parse_failed
+        """
+        METRICS.inc("items_total", result=result)
+        self.items_finished += 1
+        self.last_progress_at = time.time()
+        started = self.item_started.pop(job.url, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        METRICS.observe("item_seconds", elapsed, result=result)
+        self.item_seconds.append(elapsed)
+        title = str(job.movie_info.title) if job.movie_info else ""
+        heapq.heappush(self.slowest_items, (elapsed, job.url, title))
+        if len(self.slowest_items) > 10:
+            heapq.heappop(self.slowest_items)
+
+    def _estimate_item_cost(self) -> float:
+        """根据最近一次运行报告估算每个任务的平均耗时（秒）, 没有报告时使用 default_item_cost
+
+        任务数量按报告中 items_total 的所有处理结果合计, 包括获取或解析详情页失败和重复分享等很快结束的任务,
+        不会因为只计入转存阶段的任务而高估每个任务的耗时.
+        """
+        report_dir = self.config.report_dir
+        try:
+            names = sorted(name for name in os.listdir(report_dir) if name.startswith("run-") and name.endswith(".json"))
+        except OSError:
+            names = []
+        for name in reversed(names):
+            try:
+                with open(os.path.join(report_dir, name), 'r', encoding='utf-8') as report_file:
+                    report = json.load(report_file)
+            except (OSError, ValueError):
+                continue
+            items = sum((report.get("counters") or {}).get("items_total", {}).values())
+            if not items:
+                items = sum(report.get(key) or 0 for key in ("processed", "skipped", "failed"))
+            if items > 0:
+                return report["duration_seconds"] / items
+        return self.default_item_cost
+
+    def _has_time_for(self, items: int) -> bool:
+        """判断在截止时间之前是否还能处理指定数量的任务
+
+        本次运行已完成足够多的任务后, 改用本次运行的实际平均耗时估算. 每次运行至少处理一个任务,
+        估算耗时大于时间预算时也能逐步得到实际的耗时.
+
+        Args:
+            items: 任务数量
+
+        Returns:
+            bool: 没有截止时间或剩余时间足够时返回True
+        """
+        if self.deadline is None or (self.items_finished == 0 and items <= 1):
+            return True
+        now = time.perf_counter()
+        cost = self.item_cost
+        if self.items_finished >= self.cost_sample_items:
+            cost = (now - self.run_started) / self.items_finished
+        if now + items * cost <= self.deadline:
+            return True
+        if not self.deadline_reached:
+            self.deadline_reached = True
+            self.logger.info(f"剩余时间不足 (预计每个任务耗时 {cost:.1f}秒), 停止处理新的任务, 未完成的任务将在下次运行时继续")
+        return False
+
+    def status(self) -> dict:
+        """返回当前运行的进度、任务队列、各阶段耗时和账号剩余空间, 供状态服务在其他线程中读取"""
+        now = time.time()
+        run = None
+        if self.running:
+            run = {
+                "started_at": self.started_at,
+                "elapsed_seconds": now - self.started_at,
+                "items": METRICS.counter_by("items_total", "result"),
+                "in_progress": len(self.item_started),
+                "seconds_since_progress": now - (self.last_progress_at or self.started_at),
+                "deadline_seconds_left": self.deadline - time.perf_counter() if self.deadline is not None else None,
+            }
+        queue = self.jobs.counts()
+        queue["waiting_retry"] = self.jobs.waiting()
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "run": run,
+            "last_run": self.last_run,
+            "queue": queue,
+            "stages": {stage: {"count": values["count"], "mean": values["mean"], "max": values["max"]}
+                       for stage, values in METRICS.stages().items()},
+            "accounts": {account: {"free_bytes": free}
+                         for account, free in METRICS.gauge_by("account_free_bytes", "account").items()},
+        }
+
+    def _write_report(self, started_at: float, counts: Dict[str, int]) -> None:
+        """将本次运行的指标写入 JSON 报告和数据库的运行记录, 并按配置写入 Prometheus textfile
+
+        Args:
+            started_at: 运行开始时间戳
+            counts: 成功、跳过、失败数量
+        """
+        finished_at = time.time()
+        report = {
+            "started_at": datetime.fromtimestamp(started_at).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(timespec="seconds"),
+            "duration_seconds": finished_at - started_at,
+            **counts,
+            "slowest_items": [{"seconds": elapsed, "url": url, "title": title}
+                              for elapsed, url, title in sorted(self.slowest_items, reverse=True)],
+        }
+        try:
+            if self.config.report_dir:
+                name = datetime.fromtimestamp(started_at).strftime("run-%Y%m%d-%H%M%S.json")
+                METRICS.write_report(os.path.join(self.config.report_dir, name), report)
+            if self.config.prometheus_textfile:
+                METRICS.write_prometheus(self.config.prometheus_textfile)
+        except OSError as e:
+            self.logger.error(f"写入运行报告失败: {e}")
+        self.last_run = {key: value for key, value in report.items() if key != "slowest_items"}
+        try:
+            self.filter.record_run(build_run_record(started_at, finished_at, counts, self.item_seconds,
+                                                    self.slowest_items))
+        except Exception as e:
+            self.logger.error(f"写入运行记录失败: {e}")
+
     def collect(self, num: Tuple[int, int]) -> Config:
         """收集电影信息并保存
-        
+
         Args:
             num: 页码范围元组 (start, end)
-            
+
         Returns:
             Config: 配置对象
         """
-        processed_count = 0
-        skipped_count = 0
-        error_count = 0
-        
+        return self._run(lambda: self._iter_jobs(num))
+
+    def backfill(self, num: Tuple[int, int], shard_pages: int = None) -> Config:
+        """回填大范围的历史列表页, 按分片流式处理并逐页记录进度
+
+        Args:
+            num: 页码范围元组 (start, end)
+            shard_pages: 每个分片的列表页数量, 为None时使用 backfill_shard_pages
+
+        Returns:
+            Config: 配置对象
+        """
+        return self._run(lambda: self._iter_backfill(num, shard_pages or self.backfill_shard_pages))
+
+    def _run(self, iter_jobs: Callable[[], Iterator[Job]]) -> Config:
+        """处理任务来源产出的所有任务, 输出统计信息并写入运行报告
+
+        Args:
+            iter_jobs: 返回任务迭代器的函数, 在检查熔断器和刷新会话之后调用
+
+        Returns:
+            Config: 配置对象
+        """
+        futures: Dict[Future, Job] = {}
+        # 已通过去重检查、正在预先创建文件夹的电影
+        ready: deque = deque()
+        aborted_by = None
+        started_at = time.time()
+        METRICS.reset()
+        self.running = True
+        self.started_at = started_at
+        self.last_progress_at = None
+        self.item_started.clear()
+        self.item_seconds.clear()
+        self.slowest_items.clear()
+        self.shares.clear()
+        self.folders.clear()
+        self.open_circuit = None
+        self.items_finished = 0
+        self.deadline_reached = False
+        self.run_started = time.perf_counter()
+        self.deadline = self.run_started + self.config.run_deadline if self.config.run_deadline > 0 else None
+        if self.deadline is not None:
+            self.item_cost = self._estimate_item_cost()
+            self.logger.info(f"本次运行时间预算 {self.config.run_deadline}秒, 预计每个任务耗时 {self.item_cost:.1f}秒")
+
         try:
-            # 从爬虫获取电影信息
-            for movie_info, file_link in self.crawler.crawl(num):
-                # 检查是否已存在
-                if self.filter.filter(movie_info):
-                    self.logger.info(f"跳过已存在的电影: {movie_info}")
-                    skipped_count += 1
-                    continue
-                
-                # 处理电影
-                if self._process_movie(movie_info, file_link):
-                    processed_count += 1
-                else:
-                    error_count += 1
-                    
+            # 依赖服务仍在熔断中时直接跳过本次运行
+            check_breakers()
+
+            # 常驻模式下复用上一次运行的会话, 失效时重新登录
+            if self.runs > 0:
+                self.storage.refresh_session()
+                if self.dispatcher is not None:
+                    self.dispatcher.refresh()
+            self.jobs.prune()
+            self.failures.prune()
+
+            # 从检查点和爬虫获取电影信息
+            for job in iter_jobs():
+                # 剩余时间不足时停止, 任务保持当前状态, 下次运行时从检查点继续
+                if not self._has_time_for(len(ready) + 1):
+                    break
+
+                # 解析分享链接, 并在转存之前检查电影或文件是否已经转存过
+                if job.state == PARSED:
+                    inflight = [*futures.values(), *ready]
+                    if self._movie_exists(job, inflight):
+                        self._skip_movie(job)
+                        continue
+                    share = self._resolve_share(job)
+                    if share is None:
+                        continue
+                    if self._content_exists(job, share, inflight):
+                        self._skip_movie(job)
+                        continue
+
+                    # 先在后台创建文件夹, 等待转存的电影达到预取数量后再转存最早的一部
+                    if self.prefetcher is not None:
+                        self._prefetch_folder(job)
+                        ready.append(job)
+                        if len(ready) <= self.prefetch_items:
+                            continue
+                        job = ready.popleft()
+
+                self._start_movie(job, futures)
+
+            while ready:
+                self._start_movie(ready.popleft(), futures)
+
         except KeyboardInterrupt:
             self.logger.info("用户中断")
+        except CircuitOpenError as e:
+            aborted_by = e.name
+            self.logger.error(f"依赖服务不可用, 终止本次运行: {e}, 未完成的任务将在下次运行时继续")
         except Exception as e:
             self.logger.error(f"收集过程中发生错误: {e}")
         finally:
-            # 关闭资源并输出统计信息
-            self.filter.close()
-            self.logger.info(f"处理完成: 成功 {processed_count}, 跳过 {skipped_count}, 失败 {error_count}")
+            # 提前终止时, 尚未转存的电影记录预先创建的文件夹, 下次运行时继续使用, 不留下空文件夹
+            while ready:
+                self._take_prefetched_folder(ready.popleft())
+
+            # 等待并行转存完成
+            if futures:
+                self._drain(futures, wait_all=True)
+
+            # 输出统计信息, 包括在获取和解析详情页时就已结束的任务
+            self.running = False
+            self.runs += 1
+            counts = self._result_counts()
+            self.logger.info(f"处理完成: 成功 {counts['processed']}, 跳过 {counts['skipped']}, 失败 {counts['failed']}")
+            aborted_by = aborted_by or (self.open_circuit.name if self.open_circuit else None)
+            self._write_report(started_at, {**counts, "aborted_by": aborted_by,
+                                            "deadline_reached": self.deadline_reached,
+                                            "breakers": breaker_states()})
             return self.config
 
+    def close(self) -> None:
+        """关闭数据库连接和转存工作线程"""
+        unregister_status("collector", self.status)
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown()
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown(wait=True)
+        self.filter.close()
+        self.jobs.close()
+        self.failures.close()
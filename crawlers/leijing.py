@@ -1,11 +1,14 @@
 import random
 import time
-from typing import Tuple
-
-from lxml import etree
+from typing import Iterator, List, Tuple
 
 from models.config import Config
 from models.crawler import Crawler
+from models.movie_info import MovieInfo
+from utils.circuit_breaker import get_breaker
+from utils.extractor import PageExtractor, declared_encoding
+from utils.failure_cache import PARSE_FAILED, FETCH_FAILED
+from utils.metrics import METRICS
 from utils.web import WebRequests
 
 
@@ -33,87 +36,127 @@ You Only Live Once, 2025, http://cloud.189.cn/t/MRnMfemUvQ3u
 
 请记住：只输出提取的三项信息，不要添加任何额外内容。'''
 
-    def __init__(self, config: Config, parser, logger):
-        self.web = WebRequests(logger=logger, timeout=5)
+    # 站点名称, 用于在配置文件中覆盖选择器
+    name = "leijing"
+    # 站点地址和标签ID
+    base_url = "https://www.leijing.xyz"
+    tag_id = "42204681950354"
+    # 页面选择器, 可在配置文件的 [selectors.leijing] 中覆盖
+    selectors = {
+        # 列表页中的详情页链接
+        "detail_links": '/html/body/div[2]/div/div[2]/div/div/div/div[2]/h2/a/@href',
+        # 详情页中电影信息部分的文本
+        "content": '/html/body/div[2]/div/div/div[1]/div[1]/div[3]//text()',
+    }
+    # 列表页请求后的最大随机延时（秒）
+    page_sleep = 2.0
+    # 详情页请求后的随机延时范围（秒）
+    detail_sleep = (1.5, 3.0)
+
+    def __init__(self, config: Config, parser, logger, tag_id: str = None):
+        self.web = WebRequests(logger=logger, timeout=5,
+                               breaker=get_breaker("leijing", failure_threshold=5, reset_timeout=300, logger=logger))
         self.config = config
+        if tag_id:
+            self.tag_id = tag_id
         self.parser = parser(config, logger)
+        self.extractor = PageExtractor({**self.selectors, **config.selectors.get(self.name, {})})
         self.logger = logger
+        # 失败记录, 由收集器设置; 屏蔽期内的详情页不再请求
+        self.failures = None
+
+    @classmethod
+    def from_config(cls, config: Config, parser, logger) -> List["LeiJing"]:
+        """按配置中的标签ID为每个标签创建一个爬虫, 未配置时使用默认标签"""
+        if not config.tags:
+            return [cls(config, parser, logger)]
+        return [cls(config, parser, logger, tag_id=str(tag_id)) for tag_id in config.tags]
+
+    @property
+    def source(self) -> str:
+        """列表页来源, 用于记录回填进度"""
+        return f"{self.base_url}/?tagId={self.tag_id}"
+
+    def iter_detail_pages(self, page_start: int, page_end: int) -> Iterator[Tuple[int, List[str]]]:
+        """逐页请求列表页, 请求下一页之前随机延时; 调用方停止迭代时不再请求后面的列表页
 
-    def get_detail_page(self, page_start: int, page_end: int):
-        url = f"https://www.leijing.xyz/?tagId=42204681950354"
-        total_url = []
-        i = page_start
-        while i <= page_end:
-            r = self.web.get(f"{url}&page={i}")
-            html = etree.HTML(r.text)
-            nodes = html.xpath('/html/body/div[2]/div/div[2]/div/div/div/div[2]/h2/a/@href')
-            for node in nodes:
-                total_url.append(f"https://www.leijing.xyz/{node}")
-            i += 1
-            time.sleep(random.random() * 2)
-        return total_url
-
-    def crawl(self, num: Tuple[int, int]):
-        """从指定页码范围爬取电影信息
-        
         Args:
-            num: 起始和结束页码元组 (start_page, end_page)
-            
+            page_start: 起始页码
+            page_end: 结束页码
+
         Yields:
-            Tuple: 包含电影信息对象和分享链接的元组
+            Tuple[int, List[str]]: 页码和该页按顺序排列的全部详情页链接
+        """
+        for page in range(page_start, page_end + 1):
+            if page > page_start:
+                with METRICS.timer("sleep"):
+                    time.sleep(random.random() * self.page_sleep)
+            with METRICS.timer("crawl"):
+                r = self.web.get(f"{self.source}&page={page}")
+                nodes = self.extractor.values(self.extractor.parse(r.content, declared_encoding(r)), "detail_links")
+                urls = [f"{self.base_url}/{node}" for node in nodes]
+            yield page, urls
+
+    def is_blocked(self, url: str) -> bool:
+        """详情页近期处理失败, 屏蔽期内不再请求"""
+        if self.failures is not None and self.failures.blocked(url):
+            self.logger.debug("详情页近期处理失败, 跳过: %s", url)
+            return True
+        return False
+
+    def fetch_detail(self, url: str) -> str | None:
+        """请求详情页并提取正文文本
+
+        Args:
+            url: 详情页链接
+
+        Returns:
+            str | None: 正文文本, 失败时返回None
         """
-        try:
-            # 获取所有详情页URL
-            self.logger.info(f"开始爬取第{num[0]}页到第{num[1]}页的电影信息")
-            total_urls = self.get_detail_page(num[0], num[1])
-            self.logger.info(f"共获取到{len(total_urls)}个电影详情页链接")
-            
-            # 设置页面间隔时间范围（秒）
-            min_sleep, max_sleep = 1.5, 3.0
-            
-            # 爬取每个详情页
-            for index, url in enumerate(total_urls, 1):
-                try:
-                    self.logger.debug(f"开始处理第{index}/{len(total_urls)}个链接: {url}")
-                    
-                    # 请求详情页
-                    response = self.web.get(url)
-                    if response.status_code != 200:
-                        self.logger.warning(f"获取页面失败: {url}, 状态码: {response.status_code}")
-                        continue
-                    
-                    # 解析HTML内容
-                    html = etree.HTML(response.text)
-                    # 使用更稳健的XPath选择器提取电影信息部分
-                    content_nodes = html.xpath('/html/body/div[2]/div/div/div[1]/div[1]/div[3]//text()')
-                    if not content_nodes:
-                        self.logger.warning(f"无法获取电影信息内容: {url}")
-                        continue
-                        
-                    # 处理提取的文本内容
-                    info_html = '\n'.join([s.strip() for s in content_nodes if s.strip()])
-                    
-                    # 调用解析器提取信息
-                    movie_info, share_link = self.parser.parse(info_html, self.prompt)
-                    if not movie_info or not share_link:
-                        self.logger.warning(f"解析失败: {url}")
-                        continue
-                        
-                    self.logger.debug(f"成功提取电影信息: {movie_info}")
-                    
-                    # 随机延时，防止请求过快
-                    sleep_time = min_sleep + random.random() * (max_sleep - min_sleep)
-                    time.sleep(sleep_time)
-                    
-                    yield movie_info, share_link
-                    
-                except TypeError as e:
-                    self.logger.error(f"解析类型错误: {url}, 错误: {e}")
-                    continue
-                except Exception as e:
-                    self.logger.error(f"处理详情页异常: {url}, 错误: {e}")
-                    continue
-                    
-        except Exception as e:
-            self.logger.error(f"爬取过程中发生错误: {e}")
-            raise
\ No newline at end of file
+        with METRICS.timer("detail"):
+            # 请求详情页
+            response = self.web.get(url)
+            if response.status_code != 200:
+                self.logger.warning(f"获取页面失败: {url}, 状态码: {response.status_code}")
+                self._record_failure(url, FETCH_FAILED, f"状态码: {response.status_code}")
+                return None
+
+            # 解析HTML内容并提取电影信息部分的文本
+            info_html = self.extractor.text(self.extractor.parse(response.content, declared_encoding(response)),
+                                            "content")
+            if not info_html:
+                self.logger.warning(f"无法获取电影信息内容: {url}")
+                self._record_failure(url, FETCH_FAILED, "无法获取电影信息内容")
+                return None
+
+        # 随机延时，防止请求过快
+        min_sleep, max_sleep = self.detail_sleep
+        with METRICS.timer("sleep"):
+            time.sleep(min_sleep + random.random() * (max_sleep - min_sleep))
+
+        return info_html
+
+    def extract(self, url: str, text: str) -> Tuple[MovieInfo, str] | None:
+        """调用解析器从详情页正文中提取电影信息
+
+        Args:
+            url: 详情页链接
+            text: 详情页正文文本
+
+        Returns:
+            Tuple: 电影信息对象和分享链接, 失败时返回None
+        """
+        with METRICS.timer("parse"):
+            result = self.parser.parse(text, self.prompt)
+        if not result or not result[0] or not result[1]:
+            self.logger.warning(f"解析失败: {url}")
+            self._record_failure(url, PARSE_FAILED, "解析失败")
+            return None
+        movie_info, share_link = result
+
+        self.logger.debug("成功提取电影信息: %s", movie_info)
+        return movie_info, share_link
+
+    def _record_failure(self, url: str, failure: str, error: str) -> None:
+        if self.failures is not None:
+            self.failures.record(url, failure, error)
@@ -1,14 +1,27 @@
+from typing import Iterable, List, Optional, Tuple
+
 import mysql.connector
 
 from models.config import Config
+from models.content import ContentInfo, content_values
 from models.filter import Filter
 from models.movie_info import MovieInfo
+from models.run import RUN_COLUMNS, RunRecord, run_from_row, run_values
+from utils.title import TitleIndex
+
+# 按内容去重时记录的列
+CONTENT_COLUMNS = {"share_id": "VARCHAR(64)", "file_id": "VARCHAR(64)", "file_size": "BIGINT",
+                   "file_name": "VARCHAR(255)"}
 
 
 class MySQLFilter(Filter):
+    # 标题相似度阈值, 标准化后的标题相似度达到阈值时视为同一部电影
+    title_similarity = 0.8
+
     def __init__(self, config: Config, logger):
         self.config = config
         self.logger = logger
+        self.titles = None
         self.conn = mysql.connector.connect(user=config.db_info.username, password=config.db_info.password, database=config.db_info.database)
         self.cursor = self.conn.cursor()
 
@@ -22,15 +35,122 @@ class MySQLFilter(Filter):
                 account_id TEXT NULL 
             )
         ''')
+        # 旧数据库没有内容列时补充
+        self.cursor.execute('SHOW COLUMNS FROM movies')
+        columns = {row[0] for row in self.cursor.fetchall()}
+        for column, column_type in CONTENT_COLUMNS.items():
+            if column not in columns:
+                self.cursor.execute(f'ALTER TABLE movies ADD COLUMN {column} {column_type} NULL')
+        self.cursor.execute('SHOW INDEX FROM movies')
+        indexes = {row[2] for row in self.cursor.fetchall()}
+        if 'idx_movies_file_id' not in indexes:
+            self.cursor.execute('CREATE INDEX idx_movies_file_id ON movies (file_id)')
+        if 'idx_movies_file_size' not in indexes:
+            self.cursor.execute('CREATE INDEX idx_movies_file_size ON movies (file_size, file_name)')
+        if 'idx_movies_name' not in indexes:
+            self.cursor.execute('CREATE INDEX idx_movies_name ON movies (name(191), year)')
+        # 每次运行的统计
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                started_at VARCHAR(19) NOT NULL,
+                finished_at VARCHAR(19) NOT NULL,
+                duration_seconds DOUBLE NOT NULL,
+                processed INTEGER NOT NULL,
+                skipped INTEGER NOT NULL,
+                failed INTEGER NOT NULL,
+                item_p50 DOUBLE NULL,
+                item_p95 DOUBLE NULL,
+                llm_tokens BIGINT NOT NULL,
+                http_requests BIGINT NOT NULL,
+                saved_bytes BIGINT NOT NULL,
+                details TEXT NULL,
+                INDEX idx_runs_started_at (started_at)
+            )
+        ''')
         self.conn.commit()
 
+    def _title_index(self) -> TitleIndex:
+        """按需从数据库构建标题索引, 之后随记录增量更新"""
+        if self.titles is None:
+            self.titles = TitleIndex(self.title_similarity)
+            self.cursor.execute('select name, year from movies')
+            for name, year in self.cursor.fetchall():
+                self.titles.add(name, year)
+        return self.titles
+
     def filter(self, movie: MovieInfo) -> bool:
         self.cursor.execute('select * from movies where name = %s and year = %s', [movie.title, movie.year])
         values = self.cursor.fetchall()
-        return len(values) > 0
+        if len(values) > 0:
+            return True
+        return self._find_similar(movie)
+
+    def _find_similar(self, movie: MovieInfo) -> bool:
+        """标题不完全相同时, 按标准化后的标题查找同一年份的相似电影"""
+        similar = self._title_index().find(movie.title, movie.year)
+        if similar is None:
+            return False
+        self.logger.info(f"标题相似, 视为同一部电影: {movie.title} ≈ {similar} ({movie.year})")
+        return True
+
+    def filter_content(self, content: ContentInfo) -> bool:
+        """判断分享中的文件是否已经转存过, 同一文件, 或文件名和大小都相同时视为重复"""
+        self.cursor.execute(
+            'select 1 from movies where file_id = %s or (file_size = %s and file_name = %s) limit 1',
+            [content.file_id, content.file_size, content.file_name]
+        )
+        return len(self.cursor.fetchall()) > 0
+
+    def record(self, movie: MovieInfo, account_type, account_id, content: Optional[ContentInfo] = None) -> None:
+        self.cursor.execute(
+            'insert into movies (name, year, account_type, account_id, share_id, file_id, file_size, file_name) '
+            'values (%s, %s, %s, %s, %s, %s, %s, %s)',
+            [movie.title, movie.year, account_type, account_id, *content_values(content)]
+        )
+        self.conn.commit()
+        if self.titles is not None:
+            self.titles.add(movie.title, movie.year)
+
+    def record_many(self, records: Iterable[Tuple[MovieInfo, str, str]]) -> int:
+        """批量写入电影, 已存在的电影只补充缺失的账号信息, 在同一个事务中提交
+
+        Args:
+            records: (电影信息, 账号类型, 账号ID) 列表
+
+        Returns:
+            int: 新增的电影数量
+        """
+        added = 0
+        for movie, account_type, account_id in records:
+            self.cursor.execute(
+                'update movies set account_type = %s, account_id = %s where name = %s and year = %s and account_id is null',
+                [account_type, account_id, movie.title, movie.year]
+            )
+            self.cursor.execute(
+                'insert into movies (name, year, account_type, account_id) select %s, %s, %s, %s from dual '
+                'where not exists (select 1 from movies where name = %s and year = %s)',
+                [movie.title, movie.year, account_type, account_id, movie.title, movie.year]
+            )
+            added += self.cursor.rowcount
+            if self.titles is not None:
+                self.titles.add(movie.title, movie.year)
+        self.conn.commit()
+        return added
+
+    def record_run(self, run: RunRecord) -> None:
+        """记录一次运行的统计"""
+        self.cursor.execute(
+            f'insert into runs ({", ".join(RUN_COLUMNS)}) values ({", ".join(["%s"] * len(RUN_COLUMNS))})',
+            run_values(run)
+        )
+        self.conn.commit()
 
-    def record(self, movie: MovieInfo, account_type, account_id) -> None:
-        self.cursor.execute('insert into movies (name, year) values (%s, %s)', [movie.title, movie.year])
+    def recent_runs(self, limit: int) -> List[RunRecord]:
+        """获取最近的运行统计, 按开始时间从早到晚排列"""
+        self.cursor.execute(f'select {", ".join(RUN_COLUMNS)} from runs order by started_at desc, id desc limit %s',
+                            [limit])
+        return [run_from_row(row) for row in reversed(self.cursor.fetchall())]
 
     def close(self):
         self.conn.commit()
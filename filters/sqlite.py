@@ -1,41 +1,187 @@
 import sqlite3
+from typing import Iterable, List, Optional, Tuple
 
 from models.config import Config
+from models.content import ContentInfo, content_values
 from models.filter import Filter
 from models.movie_info import MovieInfo
+from models.run import RUN_COLUMNS, RunRecord, run_from_row, run_values
+from utils.title import TitleIndex
+
+# 按内容去重时记录的列
+CONTENT_COLUMNS = {"share_id": "TEXT", "file_id": "TEXT", "file_size": "INTEGER", "file_name": "TEXT"}
+
+
+def create_tables(conn: sqlite3.Connection) -> None:
+    """创建电影表和运行记录表, 旧数据库缺少的列和索引一并补充, 由调用方提交"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            account_type TEXT NULL,
+            account_id TEXT NULL 
+        )
+    ''')
+    # 旧数据库没有内容列时补充
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(movies)').fetchall()}
+    for column, column_type in CONTENT_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f'ALTER TABLE movies ADD COLUMN {column} {column_type} NULL')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_movies_file_id ON movies (file_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_movies_file_size ON movies (file_size, file_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_movies_name ON movies (name, year)')
+    # 每次运行的统计
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_seconds REAL NOT NULL,
+            processed INTEGER NOT NULL,
+            skipped INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            item_p50 REAL NULL,
+            item_p95 REAL NULL,
+            llm_tokens INTEGER NOT NULL,
+            http_requests INTEGER NOT NULL,
+            saved_bytes INTEGER NOT NULL,
+            details TEXT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at)')
+
+
+def insert_movie(conn: sqlite3.Connection, movie: MovieInfo, account_type, account_id,
+                 content: Optional[ContentInfo] = None) -> None:
+    """写入一部电影, 由调用方提交"""
+    conn.execute(
+        'insert into movies (name, year, account_type, account_id, share_id, file_id, file_size, file_name) '
+        'values (?, ?, ?, ?, ?, ?, ?, ?)',
+        [movie.title, movie.year, account_type, account_id, *content_values(content)]
+    )
+
+
+def insert_movies(conn: sqlite3.Connection, records: List[Tuple[MovieInfo, str, str]]) -> int:
+    """批量写入电影, 已存在的电影只补充缺失的账号信息, 由调用方提交
+
+    Returns:
+        int: 新增的电影数量
+    """
+    conn.executemany(
+        'update movies set account_type = ?, account_id = ? where name = ? and year = ? and account_id is null',
+        [(account_type, account_id, movie.title, movie.year) for movie, account_type, account_id in records]
+    )
+    before = conn.total_changes
+    conn.executemany(
+        'insert into movies (name, year, account_type, account_id) select ?, ?, ?, ? '
+        'where not exists (select 1 from movies where name = ? and year = ?)',
+        [(movie.title, movie.year, account_type, account_id, movie.title, movie.year)
+         for movie, account_type, account_id in records]
+    )
+    return conn.total_changes - before
+
+
+def insert_run(conn: sqlite3.Connection, run: RunRecord) -> None:
+    """写入一次运行的统计, 由调用方提交"""
+    conn.execute(f'insert into runs ({", ".join(RUN_COLUMNS)}) values ({", ".join("?" * len(RUN_COLUMNS))})',
+                 run_values(run))
+
+
+def movie_exists(conn: sqlite3.Connection, movie: MovieInfo) -> bool:
+    """按标题和年份精确查找电影"""
+    return conn.execute('select 1 from movies where name = ? and year = ? limit 1',
+                        [movie.title, movie.year]).fetchone() is not None
+
+
+def content_exists(conn: sqlite3.Connection, content: ContentInfo) -> bool:
+    """判断分享中的文件是否已经转存过, 同一文件, 或文件名和大小都相同时视为重复"""
+    return conn.execute(
+        'select 1 from movies where file_id = ? or (file_size = ? and file_name = ?) limit 1',
+        [content.file_id, content.file_size, content.file_name]
+    ).fetchone() is not None
+
+
+def select_runs(conn: sqlite3.Connection, limit: int) -> List[RunRecord]:
+    """获取最近的运行统计, 按开始时间从早到晚排列"""
+    rows = conn.execute(f'select {", ".join(RUN_COLUMNS)} from runs order by started_at desc, id desc limit ?',
+                        [limit]).fetchall()
+    return [run_from_row(row) for row in reversed(rows)]
 
 
 class SQLiteFilter(Filter):
+    # 标题相似度阈值, 标准化后的标题相似度达到阈值时视为同一部电影
+    title_similarity = 0.8
+
     def __init__(self, config: Config, logger):
         self.conn = sqlite3.connect('data/movies.db')
         self.logger = logger
         self.cursor = self.conn.cursor()
+        self.titles = None
 
     def init_db(self):
-        self.cursor = self.conn.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                year INTEGER NOT NULL,
-                account_type TEXT NULL,
-                account_id TEXT NULL 
-            )
-        ''')
-
-    def record(self, movie: MovieInfo, account_type, account_id):
-        self.cursor.execute(
-            'insert into movies (name, year, account_type, account_id) values (?, ?, ?, ?)',
-            [movie.title, movie.year, account_type, account_id]
-        )
+        create_tables(self.conn)
+        self.conn.commit()
+
+    def record(self, movie: MovieInfo, account_type, account_id, content: Optional[ContentInfo] = None):
+        insert_movie(self.conn, movie, account_type, account_id, content)
+        self.conn.commit()
+        if self.titles is not None:
+            self.titles.add(movie.title, movie.year)
+
+    def record_many(self, records: Iterable[Tuple[MovieInfo, str, str]]) -> int:
+        """批量写入电影, 已存在的电影只补充缺失的账号信息, 在同一个事务中提交
+
+        Args:
+            records: (电影信息, 账号类型, 账号ID) 列表
+
+        Returns:
+            int: 新增的电影数量
+        """
+        records = list(records)
+        added = insert_movies(self.conn, records)
+        self.conn.commit()
+        if self.titles is not None:
+            for movie, _, _ in records:
+                self.titles.add(movie.title, movie.year)
+        return added
+
+    def record_run(self, run: RunRecord) -> None:
+        """记录一次运行的统计"""
+        insert_run(self.conn, run)
+        self.conn.commit()
+
+    def recent_runs(self, limit: int) -> List[RunRecord]:
+        """获取最近的运行统计, 按开始时间从早到晚排列"""
+        return select_runs(self.conn, limit)
+
+    def _title_index(self) -> TitleIndex:
+        """按需从数据库构建标题索引, 之后随记录增量更新"""
+        if self.titles is None:
+            self.titles = TitleIndex(self.title_similarity)
+            self.cursor.execute('select name, year from movies')
+            for name, year in self.cursor.fetchall():
+                self.titles.add(name, year)
+        return self.titles
 
     def filter(self, movie: MovieInfo):
-        self.cursor.execute('select * from movies where name = ? and year = ?', [movie.title, movie.year])
-        values = self.cursor.fetchall()
-        return len(values) > 0
+        if movie_exists(self.conn, movie):
+            return True
+        return self._find_similar(movie)
+
+    def _find_similar(self, movie: MovieInfo) -> bool:
+        """标题不完全相同时, 按标准化后的标题查找同一年份的相似电影"""
+        similar = self._title_index().find(movie.title, movie.year)
+        if similar is None:
+            return False
+        self.logger.info(f"标题相似, 视为同一部电影: {movie.title} ≈ {similar} ({movie.year})")
+        return True
+
+    def filter_content(self, content: ContentInfo) -> bool:
+        """判断分享中的文件是否已经转存过, 同一文件, 或文件名和大小都相同时视为重复"""
+        return content_exists(self.conn, content)
 
     def close(self):
         self.conn.commit()
         self.cursor.close()
         self.conn.close()
-
@@ -0,0 +1,199 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from filters.sqlite import (content_exists, create_tables, insert_movie, insert_movies, insert_run, movie_exists,
+                            select_runs)
+from models.config import Config
+from models.content import ContentInfo
+from models.filter import Filter
+from models.movie_info import MovieInfo
+from models.run import RunRecord
+from utils.metrics import METRICS
+from utils.title import TitleIndex
+
+# 通知写线程退出
+_STOP = object()
+
+
+class ConcurrentSQLiteFilter(Filter):
+    """可以在多个线程中同时使用的 SQLite 过滤器
+
+    所有写操作由一个专用的写线程从队列中取出执行, 同时排队的写操作合并到同一个事务中提交,
+    每个写操作使用各自的保存点, 失败时只回滚自己. 写方法在所属事务提交后返回, 之后的查询一定能看到写入的记录.
+    每个线程使用各自的只读连接, 数据库使用 WAL 模式, 查询不会被写入阻塞.
+    """
+
+    # 标题相似度阈值, 标准化后的标题相似度达到阈值时视为同一部电影
+    title_similarity = 0.8
+    # 一个事务中最多合并的写操作数量
+    max_batch = 256
+    # 等待数据库锁的时间（秒）, 其他进程写入时使用
+    busy_timeout = 30.0
+
+    def __init__(self, config: Config, logger, db_path: str = 'data/movies.db'):
+        """初始化过滤器并启动写线程
+
+        Args:
+            config: 配置对象
+            logger: 日志记录器
+            db_path: 数据库文件路径
+        """
+        self.logger = logger
+        self.db_path = db_path
+        self.titles: Optional[TitleIndex] = None
+        self.titles_lock = threading.Lock()
+        self.local = threading.local()
+        self.readers: List[sqlite3.Connection] = []
+        self.readers_lock = threading.Lock()
+        self.queue: queue.Queue = queue.Queue()
+
+        # 写连接只在写线程中使用; 自动提交模式下由写线程显式开启和提交事务
+        self.writer = sqlite3.connect(db_path, timeout=self.busy_timeout, isolation_level=None,
+                                      check_same_thread=False)
+        self.writer.execute('PRAGMA journal_mode=WAL')
+        self.writer.execute('PRAGMA synchronous=NORMAL')
+        self.thread = threading.Thread(target=self._write_loop, name="filter-writer", daemon=True)
+        self.thread.start()
+
+    def _reader(self) -> sqlite3.Connection:
+        """返回当前线程的只读连接, 不存在时创建"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+            conn.execute('PRAGMA query_only=ON')
+            self.local.conn = conn
+            with self.readers_lock:
+                self.readers.append(conn)
+        return conn
+
+    def _write(self, operation: Callable[[sqlite3.Connection], object]):
+        """将写操作交给写线程执行, 并等待所属事务提交
+
+        Args:
+            operation: 以写连接为参数的函数, 不需要提交
+
+        Returns:
+            写操作的返回值
+
+        Raises:
+            Exception: 写操作或提交失败
+        """
+        future = Future()
+        self.queue.put((operation, future))
+        return future.result()
+
+    def _write_loop(self) -> None:
+        """写线程: 取出排队的写操作, 合并到一个事务中执行并提交"""
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+            if not batch:
+                continue
+
+            results = []
+            try:
+                self.writer.execute('BEGIN IMMEDIATE')
+                for operation, future in batch:
+                    self.writer.execute('SAVEPOINT operation')
+                    try:
+                        results.append((future, operation(self.writer), None))
+                        self.writer.execute('RELEASE operation')
+                    except Exception as e:
+                        self.writer.execute('ROLLBACK TO operation')
+                        self.writer.execute('RELEASE operation')
+                        results.append((future, None, e))
+                self.writer.execute('COMMIT')
+            except Exception as e:
+                # 开启或提交事务失败时整批写操作都没有生效
+                if self.writer.in_transaction:
+                    self.writer.execute('ROLLBACK')
+                self.logger.error(f"写入电影数据库失败: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            METRICS.inc("filter_write_transactions_total")
+            METRICS.inc("filter_writes_total", len(batch))
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def init_db(self) -> None:
+        self._write(create_tables)
+
+    def record(self, movie: MovieInfo, account_type, account_id, content: Optional[ContentInfo] = None) -> None:
+        self._write(lambda conn: insert_movie(conn, movie, account_type, account_id, content))
+        with self.titles_lock:
+            if self.titles is not None:
+                self.titles.add(movie.title, movie.year)
+
+    def record_many(self, records: Iterable[Tuple[MovieInfo, str, str]]) -> int:
+        """批量写入电影, 已存在的电影只补充缺失的账号信息, 在同一个事务中提交
+
+        Args:
+            records: (电影信息, 账号类型, 账号ID) 列表
+
+        Returns:
+            int: 新增的电影数量
+        """
+        records = list(records)
+        added = self._write(lambda conn: insert_movies(conn, records))
+        with self.titles_lock:
+            if self.titles is not None:
+                for movie, _, _ in records:
+                    self.titles.add(movie.title, movie.year)
+        return added
+
+    def record_run(self, run: RunRecord) -> None:
+        """记录一次运行的统计"""
+        self._write(lambda conn: insert_run(conn, run))
+
+    def recent_runs(self, limit: int) -> List[RunRecord]:
+        """获取最近的运行统计, 按开始时间从早到晚排列"""
+        return select_runs(self._reader(), limit)
+
+    def _title_index(self) -> TitleIndex:
+        """按需从数据库构建标题索引, 之后随记录增量更新; 索引本身是线程安全的"""
+        with self.titles_lock:
+            if self.titles is None:
+                titles = TitleIndex(self.title_similarity)
+                for name, year in self._reader().execute('select name, year from movies'):
+                    titles.add(name, year)
+                self.titles = titles
+            return self.titles
+
+    def filter(self, movie: MovieInfo) -> bool:
+        if movie_exists(self._reader(), movie):
+            return True
+        similar = self._title_index().find(movie.title, movie.year)
+        if similar is None:
+            return False
+        self.logger.info(f"标题相似, 视为同一部电影: {movie.title} ≈ {similar} ({movie.year})")
+        return True
+
+    def filter_content(self, content: ContentInfo) -> bool:
+        """判断分享中的文件是否已经转存过, 同一文件, 或文件名和大小都相同时视为重复"""
+        return content_exists(self._reader(), content)
+
+    def close(self) -> None:
+        """等待排队的写操作完成后关闭写线程和所有连接"""
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.writer.close()
+        with self.readers_lock:
+            for conn in self.readers:
+                conn.close()
+            self.readers.clear()
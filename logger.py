@@ -1,18 +1,89 @@
+import atexit
+import json
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional, Dict, Union, Literal
 
-import colorlog
-
 from models.logger import Logger
 
+# 日志队列的最大长度, 队列已满时丢弃新的日志而不是阻塞工作线程
+LOG_QUEUE_SIZE = 10000
+
+# 日志格式, 可选值: text, json; 可通过环境变量 LOG_FORMAT 设置
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
+# 各日志记录器对应的后台输出线程
+_listeners: Dict[str, QueueListener] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """结构化日志格式, 每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        item = {
+            "time": self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            item["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(item, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """非阻塞的队列日志处理器
+
+    工作线程只把日志放入有界队列, 由后台线程负责格式化和输出;
+    队列已满时丢弃日志并计数, 避免日志输出拖慢工作线程或占用过多内存.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _create_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+
+    import colorlog
+
+    # 定义颜色输出格式
+    return colorlog.ColoredFormatter(
+        '%(log_color)s%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s',
+        log_colors={
+            'DEBUG': 'cyan',
+            'INFO': 'green',
+            'WARNING': 'yellow',
+            'ERROR': 'red',
+            'CRITICAL': 'red,bg_white',
+        },
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
 
-def get_logger(level: int = logging.INFO, name: str = "") -> logging.Logger:
+def get_logger(level: int = logging.INFO, name: str = "", log_format: Optional[str] = None) -> logging.Logger:
     """获取配置好的日志记录器
+
+    日志先放入队列, 由后台线程统一输出到控制台, 调用方不会因为输出阻塞.
     
     Args:
         level: 日志级别，默认为INFO
         name: 日志记录器名称，默认为空字符串（根记录器）
+        log_format: 日志格式, text 为彩色文本, json 为结构化日志; 默认使用 LOG_FORMAT.
+            只在第一次创建日志记录器时生效
         
     Returns:
         logging.Logger: 配置好的日志记录器
@@ -28,25 +99,14 @@ def get_logger(level: int = logging.INFO, name: str = "") -> logging.Logger:
     # 创建控制台日志处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
-    
-    # 定义颜色输出格式
-    color_formatter = colorlog.ColoredFormatter(
-        '%(log_color)s%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s',
-        log_colors={
-            'DEBUG': 'cyan',
-            'INFO': 'green',
-            'WARNING': 'yellow',
-            'ERROR': 'red',
-            'CRITICAL': 'red,bg_white',
-        },
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # 将颜色输出格式添加到控制台日志处理器
-    console_handler.setFormatter(color_formatter)
-    
-    # 添加控制台处理器到logger
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(_create_formatter(log_format or LOG_FORMAT))
+
+    # 控制台处理器由后台线程调用, logger 上只挂载队列处理器
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
+    logger.addHandler(DroppingQueueHandler(log_queue))
     
     # 设置不向上层logger传播
     logger.propagate = False
@@ -54,6 +114,14 @@ def get_logger(level: int = logging.INFO, name: str = "") -> logging.Logger:
     return logger
 
 
+@atexit.register
+def shutdown_logging() -> None:
+    """停止后台输出线程, 输出队列中剩余的日志"""
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+
 def setup_file_logger(logger: logging.Logger, log_file: str, 
                       level: int = logging.INFO) -> logging.Logger:
     """为给定的日志记录器添加文件处理器
@@ -80,8 +148,12 @@ def setup_file_logger(logger: logging.Logger, log_file: str,
     )
     file_handler.setFormatter(formatter)
     
-    # 添加到logger
-    logger.addHandler(file_handler)
+    # 已使用队列输出时由后台线程写文件, 否则直接添加到logger
+    listener = _listeners.get(logger.name if logger.name != "root" else "")
+    if listener is not None:
+        listener.handlers = (*listener.handlers, file_handler)
+    else:
+        logger.addHandler(file_handler)
     
     return logger
 
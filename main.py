@@ -1,17 +1,22 @@
+import argparse
 import logging
 import os
 import sys
+import threading
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
-import toml
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
-
-from collector import Collector
 from logger import get_logger
 from models.config import Config, AccountInfo, DBInfo
 
+# 较重的依赖（toml、apscheduler、收集器及其依赖的 requests、lxml、pycryptodome）在首次使用时才导入,
+# 以缩短每次启动容器时的冷启动时间, 参见 benchmarks/import_time.py
+if TYPE_CHECKING:
+    from collector import Collector
+    from reconciler import Reconciler
+    from utils.status_server import StatusServer
+
 
 def load_config(config_path: str) -> Config:
     """加载配置文件
@@ -26,6 +31,8 @@ def load_config(config_path: str) -> Config:
         FileNotFoundError: 配置文件不存在
         ValueError: 配置文件格式错误
     """
+    import toml
+
     try:
         config_file = Path(config_path)
         if not config_file.exists():
@@ -59,7 +66,15 @@ def load_config(config_path: str) -> Config:
             model=config_dict.get("model", ""),
             token=config_dict.get("token", ""),
             cron=config_dict.get("cron", ""),
-            db_info=db_info
+            db_info=db_info,
+            parallel_saves=config_dict.get("parallel_saves", False),
+            daemon=config_dict.get("daemon", False),
+            report_dir=config_dict.get("report_dir", "data/reports"),
+            prometheus_textfile=config_dict.get("prometheus_textfile", ""),
+            tags=[str(tag) for tag in config_dict.get("tags", [])],
+            selectors=config_dict.get("selectors", {}),
+            run_deadline=config_dict.get("run_deadline", 0),
+            status_port=config_dict.get("status_port", 0)
         )
     except toml.TomlDecodeError as e:
         raise ValueError(f"配置文件格式错误: {e}")
@@ -72,6 +87,8 @@ def save_config(config: Config, config_path: str) -> None:
         config: 配置对象
         config_path: 配置文件路径
     """
+    import toml
+
     # 确保目录存在
     os.makedirs(os.path.dirname(config_path), exist_ok=True)
     
@@ -83,6 +100,14 @@ def save_config(config: Config, config_path: str) -> None:
         "model": config.model,
         "token": config.token,
         "cron": config.cron,
+        "parallel_saves": config.parallel_saves,
+        "daemon": config.daemon,
+        "report_dir": config.report_dir,
+        "prometheus_textfile": config.prometheus_textfile,
+        "tags": config.tags,
+        "selectors": config.selectors,
+        "run_deadline": config.run_deadline,
+        "status_port": config.status_port,
         "accounts": [
             {
                 "username": account.username,
@@ -101,29 +126,165 @@ def save_config(config: Config, config_path: str) -> None:
         toml.dump(config_dict, toml_file)
 
 
-def run_collector(config_path: str, log_level: int) -> None:
+def build_collector(config: Config, logger) -> "Collector":
+    """创建收集器
+
+    Args:
+        config: 配置对象
+        logger: 日志记录器
+
+    Returns:
+        Collector: 收集器
+    """
+    from collector import Collector
+    from crawlers.leijing import LeiJing
+    from filters.sqlite import SQLiteFilter
+    from parsers.openai import OpenAIParser
+    from storages.cloud189 import Cloud189Storage
+
+    return Collector(config, logger, Cloud189Storage, LeiJing, OpenAIParser, SQLiteFilter)
+
+
+def build_reconciler(config: Config, logger) -> "Reconciler":
+    """创建数据库重建工具
+
+    Args:
+        config: 配置对象
+        logger: 日志记录器
+
+    Returns:
+        Reconciler: 数据库重建工具
+    """
+    from filters.sqlite import SQLiteFilter
+    from reconciler import Reconciler
+    from storages.cloud189 import Cloud189Storage
+
+    return Reconciler(config, logger, Cloud189Storage, SQLiteFilter)
+
+
+def run_reconcile(config_path: str, log_level: int, full: bool = False) -> None:
+    """根据网盘中已转存的文件夹重建电影数据库
+
+    Args:
+        config_path: 配置文件路径
+        log_level: 日志等级
+        full: 是否重新遍历全部文件夹
+    """
+    logger = get_logger(level=log_level)
+    try:
+        config = load_config(config_path)
+        reconciler = build_reconciler(config, logger)
+        logger.info("开始根据网盘文件夹重建电影数据库...")
+        try:
+            summary = reconciler.reconcile(full=full)
+        finally:
+            reconciler.close()
+        added = sum(account.get("added", 0) for account in summary.values())
+        logger.info(f"电影数据库重建完成, 共新增 {added} 部电影")
+        if any("error" in account for account in summary.values()):
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"重建电影数据库时发生错误: {e}")
+        sys.exit(1)
+
+
+def run_backfill(config_path: str, log_level: int, pages: Tuple[int, int], shard_pages: Optional[int] = None) -> None:
+    """回填指定页码范围内的历史列表页
+
+    Args:
+        config_path: 配置文件路径
+        log_level: 日志等级
+        pages: 页码范围元组 (start, end)
+        shard_pages: 每个分片的列表页数量, 为None时使用默认值
+    """
+    logger = get_logger(level=log_level)
+    try:
+        config = load_config(config_path)
+        collector = build_collector(config, logger)
+        try:
+            new_config = collector.backfill(pages, shard_pages)
+        finally:
+            collector.close()
+        save_config(new_config, config_path)
+        logger.info("回填完成，配置已更新")
+    except Exception as e:
+        logger.error(f"回填过程中发生错误: {e}")
+        sys.exit(1)
+
+
+def run_trends(config_path: str, log_level: int, last: int = 20) -> None:
+    """输出最近几次运行的耗时和成本趋势
+
+    Args:
+        config_path: 配置文件路径
+        log_level: 日志等级
+        last: 运行次数
+    """
+    logger = get_logger(level=log_level)
+    try:
+        from filters.sqlite import SQLiteFilter
+        from utils.run_history import format_trends
+
+        config = load_config(config_path)
+        movie_filter = SQLiteFilter(config, logger)
+        try:
+            movie_filter.init_db()
+            runs = movie_filter.recent_runs(last)
+        finally:
+            movie_filter.close()
+        print(format_trends(runs), flush=True)
+    except Exception as e:
+        logger.error(f"读取运行记录时发生错误: {e}")
+        sys.exit(1)
+
+
+def page_range(value: str) -> Tuple[int, int]:
+    """解析页码范围参数, 如 1-5000"""
+    try:
+        start, end = (int(part) for part in value.split("-", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"页码范围格式应为 START-END: {value}")
+    if start < 1 or end < start:
+        raise argparse.ArgumentTypeError(f"无效的页码范围: {value}")
+    return start, end
+
+
+def profiled(profile: Optional[str], logger):
+    """按需对一次运行进行性能分析
+
+    Args:
+        profile: 分析方式, sampling 或 cprofile, 为None时不分析
+        logger: 日志记录器
+    """
+    if not profile:
+        return nullcontext()
+    from utils.profiler import profile_run
+    return profile_run(profile, logger=logger)
+
+
+def run_collector(config_path: str, log_level: int, profile: Optional[str] = None) -> None:
     """运行收集器
     
     Args:
         config_path: 配置文件路径
         log_level: 日志等级
+        profile: 性能分析方式, 为None时不分析
     """
     try:
-        from crawlers.leijing import LeiJing
-        from filters.sqlite import SQLiteFilter
-        from parsers.openai import OpenAIParser
-        from storages.cloud189 import Cloud189Storage
-        
         # 加载配置
         config = load_config(config_path)
         logger = get_logger(level=log_level)
         
-        # 初始化收集器
-        collector = Collector(config, logger, Cloud189Storage, LeiJing, OpenAIParser, SQLiteFilter)
-        
-        # 运行收集过程
-        logger.info("开始收集电影信息...")
-        new_config = collector.collect((1, 10))
+        with profiled(profile, logger):
+            # 初始化收集器
+            collector = build_collector(config, logger)
+
+            # 运行收集过程
+            logger.info("开始收集电影信息...")
+            try:
+                new_config = collector.collect((1, 10))
+            finally:
+                collector.close()
         
         # 保存更新后的配置
         save_config(new_config, config_path)
@@ -135,20 +296,143 @@ def run_collector(config_path: str, log_level: int) -> None:
         sys.exit(1)
 
 
-def main(config_path: str = "data/config.toml", log_level: int = logging.INFO):
-    """主程序入口"""
+class CollectorDaemon:
+    """常驻模式
+
+    在定时任务之间保留收集器, 以及其中的登录会话、数据库连接和缓存,
+    只有配置文件发生变化时才重新加载配置并重建收集器. 上一次运行尚未结束时触发的任务会被直接跳过.
+    """
+
+    def __init__(self, config_path: str, log_level: int, scheduler=None, job_id: str = "collector",
+                 profile: Optional[str] = None):
+        """初始化常驻模式
+
+        Args:
+            config_path: 配置文件路径
+            log_level: 日志等级
+            scheduler: 调度器, 用于在 cron 配置变化时更新触发器
+            job_id: 调度器中的任务ID
+            profile: 性能分析方式, 为None时不分析
+        """
+        self.config_path = config_path
+        self.profile = profile
+        self.logger = get_logger(level=log_level)
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.collector = None
+        self.config_mtime = None
+        self.lock = threading.Lock()
+
+    def reload_if_changed(self) -> None:
+        """配置文件发生变化时重新加载配置并重建收集器"""
+        mtime = os.path.getmtime(self.config_path)
+        if self.collector is not None and mtime == self.config_mtime:
+            return
+
+        config = load_config(self.config_path)
+        if self.collector is not None:
+            self.logger.info("配置文件已变化, 重新加载配置")
+            if self.scheduler is not None and config.cron and config.cron != self.collector.config.cron:
+                from apscheduler.triggers.cron import CronTrigger
+                self.scheduler.reschedule_job(self.job_id, trigger=CronTrigger.from_crontab(config.cron))
+                self.logger.info(f"定时任务已更新: {config.cron}")
+            self.collector.close()
+            self.collector = None
+
+        self.collector = build_collector(config, self.logger)
+        self.config_mtime = mtime
+
+    def tick(self) -> None:
+        """执行一次收集, 与正在进行的运行重叠时直接跳过"""
+        if not self.lock.acquire(blocking=False):
+            self.logger.warning("上一次运行尚未结束, 跳过本次触发")
+            return
+
+        try:
+            self.reload_if_changed()
+            self.logger.info("开始收集电影信息...")
+            with profiled(self.profile, self.logger):
+                new_config = self.collector.collect((1, 10))
+
+            # 保存更新后的配置, 并记录保存后的修改时间以免被当作配置变化
+            save_config(new_config, self.config_path)
+            self.config_mtime = os.path.getmtime(self.config_path)
+            self.logger.info("电影收集完成，配置已更新")
+        except Exception as e:
+            self.logger.error(f"运行过程中发生错误: {e}")
+            # 出错后丢弃收集器, 下一次触发时重新创建
+            if self.collector is not None:
+                self.collector.close()
+                self.collector = None
+        finally:
+            self.lock.release()
+
+    def close(self) -> None:
+        if self.collector is not None:
+            self.collector.close()
+            self.collector = None
+
+
+def start_status_server(config: Config, logger) -> Optional["StatusServer"]:
+    """按配置启动状态服务
+
+    Args:
+        config: 配置对象
+        logger: 日志记录器
+
+    Returns:
+        StatusServer | None: 状态服务, 未配置端口时返回None
+    """
+    if not config.status_port:
+        return None
+    from utils.status_server import StatusServer
+
+    return StatusServer(config.status_port, logger).start()
+
+
+def main(config_path: str = "data/config.toml", log_level: int = logging.INFO, profile: Optional[str] = None):
+    """主程序入口
+
+    Args:
+        config_path: 配置文件路径
+        log_level: 日志等级
+        profile: 性能分析方式, 每次运行的分析结果保存到 data/profiles/, 为None时不分析
+    """
     
     try:
         # 加载配置
         config = load_config(config_path)
-        
-        # 设置调度器
-        scheduler = BlockingScheduler()
+
+        # 状态服务在后台线程中运行, 随进程退出
+        start_status_server(config, get_logger(level=log_level))
         
         if config.cron:
+            from apscheduler.schedulers.blocking import BlockingScheduler
+            from apscheduler.triggers.cron import CronTrigger
+
+            # 设置调度器
+            scheduler = BlockingScheduler()
+
+        if config.cron and config.daemon:
+            # 常驻模式, 多次运行之间复用收集器; 错过的触发合并为一次, 不会叠加运行
+            daemon = CollectorDaemon(config_path, log_level, scheduler, profile=profile)
+            daemon.reload_if_changed()
+            scheduler.add_job(
+                daemon.tick,
+                trigger=CronTrigger.from_crontab(config.cron),
+                id=daemon.job_id,
+                max_instances=1,
+                coalesce=True
+            )
+            print(f"定时任务已设置 (常驻模式): {config.cron}", flush=True)
+            try:
+                scheduler.start()
+            finally:
+                daemon.close()
+        elif config.cron:
             # 添加定时任务
             scheduler.add_job(
-                lambda: run_collector(config_path, log_level), 
+                lambda: run_collector(config_path, log_level, profile), 
                 trigger=CronTrigger.from_crontab(config.cron)
             )
             print(f"定时任务已设置: {config.cron}", flush=True)
@@ -157,7 +441,7 @@ def main(config_path: str = "data/config.toml", log_level: int = logging.INFO):
         else:
             # 直接运行
             print("没有设置定时任务, 将直接运行", flush=True)
-            run_collector(config_path, log_level)
+            run_collector(config_path, log_level, profile)
             
     except KeyboardInterrupt:
         print("程序被用户中断", flush=True)
@@ -167,5 +451,71 @@ def main(config_path: str = "data/config.toml", log_level: int = logging.INFO):
         sys.exit(1)
 
 
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="自动收集最新电影并转存到天翼云盘")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "reconcile", "backfill", "trends"],
+                        help="run 按配置运行收集 (默认); reconcile 根据网盘中已转存的文件夹重建电影数据库; "
+                             "backfill 回填 --pages 指定的历史列表页; trends 输出最近几次运行的耗时和成本趋势")
+    parser.add_argument("--config", default="data/config.toml", help="配置文件路径")
+    parser.add_argument("--full", action="store_true",
+                        help="reconcile 时忽略上次记录的文件夹修改时间, 重新遍历全部文件夹")
+    parser.add_argument("--pages", type=page_range, default=(1, 10), metavar="START-END",
+                        help="backfill 的页码范围, 如 1-5000 (默认 1-10)")
+    parser.add_argument("--shard-pages", type=int, metavar="N",
+                        help="backfill 时每个分片的列表页数量, 分片处理完后才爬取下一个分片 (默认 5)")
+    parser.add_argument("--last", type=int, default=20, metavar="N", help="trends 时列出的运行次数 (默认 20)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="日志等级")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        help="日志格式, json 为每行一条的结构化日志; 默认读取环境变量 LOG_FORMAT, 未设置时为 text")
+    parser.add_argument("--profile", nargs="?", const="sampling", choices=["sampling", "cprofile"],
+                        help="对每次运行进行性能分析, 结果保存到 data/profiles/; "
+                             "sampling 输出火焰图折叠栈 (默认), cprofile 输出 pstats 文件")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="PATH",
+                          help="将所有 HTTP 请求的响应追加录制到文件 (JSON Lines, 以 .gz 结尾时压缩)")
+    cassette.add_argument("--replay", metavar="PATH", help="从录制文件回放 HTTP 响应, 不访问外部服务")
+    parser.add_argument("--replay-latency", nargs="?", type=float, const=1.0, metavar="SCALE",
+                        help="回放时按录制时的耗时等待, 可指定缩放系数 (默认 1.0)")
+    return parser.parse_args(argv)
+
+
+def setup_cassette(args: argparse.Namespace):
+    """按命令行参数开启 HTTP 录制或回放
+
+    Returns:
+        Cassette | None: 录制文件, 未开启时返回None
+    """
+    if not args.record and not args.replay:
+        return None
+    from utils.cassette import Cassette, RECORD, REPLAY
+    from utils.web import set_cassette
+
+    cassette = Cassette(
+        args.record or args.replay,
+        RECORD if args.record else REPLAY,
+        simulate_latency=args.replay_latency is not None,
+        latency_scale=args.replay_latency or 1.0,
+        logger=get_logger()
+    )
+    set_cassette(cassette)
+    return cassette
+
+
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    get_logger(level=logging.getLevelName(args.log_level), log_format=args.log_format)
+    cassette = setup_cassette(args)
+    try:
+        if args.command == "reconcile":
+            run_reconcile(args.config, logging.getLevelName(args.log_level), args.full)
+        elif args.command == "backfill":
+            run_backfill(args.config, logging.getLevelName(args.log_level), args.pages, args.shard_pages)
+        elif args.command == "trends":
+            run_trends(args.config, logging.getLevelName(args.log_level), args.last)
+        else:
+            main(args.config, logging.getLevelName(args.log_level), args.profile)
+    finally:
+        if cassette is not None:
+            cassette.close()
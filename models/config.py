@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List
 
 
 @dataclass
@@ -24,4 +24,12 @@ class Config:
     model: str
     token: str
     cron: str
-    db_info: DBInfo
\ No newline at end of file
+    db_info: DBInfo
+    parallel_saves: bool = False  # 每个账号使用独立的工作线程并行转存
+    daemon: bool = False  # 常驻模式, 在定时任务之间保留收集器、会话和缓存
+    report_dir: str = "data/reports"  # 每次运行结束后写入 JSON 运行报告的目录, 为空时不写入
+    prometheus_textfile: str = ""  # Prometheus textfile 路径, 为空时不写入
+    tags: List[str] = field(default_factory=list)  # 雷鲸小站的标签ID, 多个标签并发爬取, 为空时使用默认标签
+    selectors: Dict[str, Dict[str, str]] = field(default_factory=dict)  # 按站点名称覆盖爬虫的页面选择器
+    run_deadline: int = 0  # 每次运行的时间预算（秒）, 剩余时间不足时停止并将未完成的任务留到下次运行, 为0时不限制
+    status_port: int = 0  # 状态服务端口, 提供 /status 和 /metrics, 为0时不启动
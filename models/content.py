@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ContentInfo:
+    """分享中需要转存的文件, 用于按内容去重"""
+    share_id: str
+    file_id: str
+    file_size: int
+    file_name: str
+
+
+def content_values(content: Optional[ContentInfo]) -> tuple:
+    """返回写入数据库的内容列, 没有内容信息时均为None"""
+    if content is None:
+        return None, None, None, None
+    return content.share_id, content.file_id, content.file_size, content.file_name
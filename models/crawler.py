@@ -2,5 +2,30 @@ from abc import ABC, abstractmethod
 
 
 class Crawler(ABC):
+    @classmethod
+    def from_config(cls, config, parser, logger):
+        """按配置创建爬虫, 一个爬虫类可以对应多个来源"""
+        return [cls(config, parser, logger)]
+
+    @property
+    @abstractmethod
+    def source(self): ...
+
+    @abstractmethod
+    def iter_detail_pages(self, page_start, page_end): ...
+
+    @abstractmethod
+    def is_blocked(self, url): ...
+
+    def get_detail_page(self, page_start, page_end):
+        """按顺序返回页码范围内所有列表页中不在屏蔽期内的详情页链接"""
+        total_url = []
+        for _, urls in self.iter_detail_pages(page_start, page_end):
+            total_url.extend(url for url in urls if not self.is_blocked(url))
+        return total_url
+
+    @abstractmethod
+    def fetch_detail(self, url): ...
+
     @abstractmethod
-    def crawl(self, num): ...
\ No newline at end of file
+    def extract(self, url, text): ...
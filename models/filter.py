@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
 
+from models.content import ContentInfo
 from models.movie_info import MovieInfo
+from models.run import RunRecord
 
 
 class Filter(ABC):
@@ -11,7 +14,19 @@ class Filter(ABC):
     def filter(self, movie: MovieInfo) -> bool: ...
 
     @abstractmethod
-    def record(self, movie: MovieInfo, account_type, account_id) -> None: ...
+    def filter_content(self, content: ContentInfo) -> bool: ...
+
+    @abstractmethod
+    def record(self, movie: MovieInfo, account_type, account_id, content: Optional[ContentInfo] = None) -> None: ...
+
+    @abstractmethod
+    def record_many(self, records: Iterable[Tuple[MovieInfo, str, str]]) -> int: ...
+
+    @abstractmethod
+    def record_run(self, run: RunRecord) -> None: ...
+
+    @abstractmethod
+    def recent_runs(self, limit: int) -> List[RunRecord]: ...
 
     @abstractmethod
     def close(self) -> None: ...
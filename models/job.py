@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from models.movie_info import MovieInfo
+
+# 任务状态, 按处理顺序排列
+DISCOVERED = "discovered"
+PARSED = "parsed"
+SAVED = "saved"
+RENAMED = "renamed"
+RECORDED = "recorded"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# 可以从断点继续处理的状态
+RESUMABLE_STATES = (DISCOVERED, PARSED, SAVED, RENAMED)
+# 已经处理完毕的状态
+FINISHED_STATES = (RECORDED, SKIPPED)
+
+
+@dataclass
+class Job:
+    url: str
+    state: str = DISCOVERED
+    movie_info: Optional[MovieInfo] = None
+    share_link: Optional[str] = None
+    folder_id: Optional[str] = None
+    file_ext: Optional[str] = None
+    file_id: Optional[str] = None
+    account_id: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
@@ -0,0 +1,38 @@
+import json
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+
+@dataclass
+class RunRecord:
+    """一次运行的统计, 写入数据库的 runs 表, 用于分析多次运行的趋势"""
+    started_at: str
+    finished_at: str
+    duration_seconds: float
+    processed: int
+    skipped: int
+    failed: int
+    item_p50: Optional[float]  # 单个任务总耗时的中位数（秒）, 没有处理任何任务时为None
+    item_p95: Optional[float]
+    llm_tokens: int
+    http_requests: int
+    saved_bytes: int
+    # 各阶段次数、各主机的请求次数和平均耗时、各账号转存的字节数、耗时最长的任务等
+    details: dict = field(default_factory=dict)
+
+
+# runs 表中按顺序排列的列
+RUN_COLUMNS = tuple(item.name for item in fields(RunRecord))
+
+
+def run_values(run: RunRecord) -> tuple:
+    """返回写入数据库的列值, details 保存为 JSON"""
+    return tuple(json.dumps(value, ensure_ascii=False) if name == "details" else value
+                 for name, value in ((name, getattr(run, name)) for name in RUN_COLUMNS))
+
+
+def run_from_row(row) -> RunRecord:
+    """从按 RUN_COLUMNS 查询的数据库行创建运行统计"""
+    values = dict(zip(RUN_COLUMNS, row))
+    values["details"] = json.loads(values["details"]) if values["details"] else {}
+    return RunRecord(**values)
@@ -9,10 +9,31 @@ class Storage(ABC):
     def rename(self, new_name, path, origin_name): ...
 
     @abstractmethod
-    def create_folder(self, folder_name, parent_folder_path): ...
+    def create_folder(self, folder_name, parent_folder_path, account_id=None): ...
 
     @abstractmethod
     def wait_until_save_complete(self, file_name, save_path): ...
 
     @abstractmethod
-    def get_current_account_info(self): ...
\ No newline at end of file
+    def get_current_account_info(self): ...
+
+    @abstractmethod
+    def switch_account(self, account_id): ...
+
+    @abstractmethod
+    def find_share_link(self, text): ...
+
+    @abstractmethod
+    def resolve_share(self, origin_file_info): ...
+
+    @abstractmethod
+    def select_account(self, share): ...
+
+    @abstractmethod
+    def get_free_space(self): ...
+
+    @abstractmethod
+    def refresh_session(self): ...
+
+    @abstractmethod
+    def iter_saved_folders(self, since=""): ...
@@ -1,8 +1,11 @@
+import time
 from typing import Tuple, Dict, Any, Optional
 
 from models.config import Config
 from models.movie_info import MovieInfo
 from models.parser import Parser
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.metrics import METRICS
 from utils.web import WebRequests
 
 
@@ -97,11 +100,41 @@ class APIError(Exception):
 
 
 class OpenAIParser(Parser):
+    # 返回 429 时最多重试的次数
+    rate_limit_retries = 3
+    # 响应中没有 Retry-After 时的初始等待时间（秒）, 之后每次加倍
+    rate_limit_wait = 2.0
+    # 单次等待时间的上限（秒）
+    max_rate_limit_wait = 30.0
+
     def __init__(self, config: Config, logger):
-        self.web = WebRequests(logger=logger, timeout=5)
+        # 令牌无效或服务异常时熔断, 不再为剩余的详情页重复请求; 请求超限只是暂时的, 等待后重试, 不计入熔断
+        self.web = WebRequests(logger=logger, timeout=5,
+                               breaker=get_breaker("llm", failure_threshold=3, reset_timeout=60,
+                                                   failure_statuses=(401, 403), logger=logger))
         self.config = config
         self.logger = logger
 
+    def _post(self, url: str, data: dict, headers: dict):
+        """发送对话补全请求, 返回 429 时按 Retry-After 或指数退避等待后重试
+
+        Returns:
+            requests.Response: 最后一次请求的响应
+        """
+        for attempt in range(self.rate_limit_retries + 1):
+            r = self.web.post(url, json=data, headers=headers)
+            if r.status_code != 429 or attempt == self.rate_limit_retries:
+                return r
+            try:
+                wait = float(r.headers.get("Retry-After", ""))
+            except ValueError:
+                wait = self.rate_limit_wait * 2 ** attempt
+            wait = min(max(wait, 0.0), self.max_rate_limit_wait)
+            METRICS.inc("llm_rate_limited_total")
+            self.logger.warning(f"API请求次数超限, {wait:.1f}秒后第{attempt + 1}次重试")
+            with METRICS.timer("sleep"):
+                time.sleep(wait)
+
     def parse(self, html, prompt) -> Tuple[MovieInfo, str] | None:
         url = f"{self.config.api_url}/chat/completions"
         data = {"model": self.config.model,
@@ -114,10 +147,14 @@ class OpenAIParser(Parser):
         headers = {"Authorization": "Bearer " + self.config.token, "Content-Type": "application/json"}
         
         try:
-            r = self.web.post(url, json=data, headers=headers)
+            r = self._post(url, data, headers)
             
             if r.status_code == 200:
-                answer = r.json().get("choices", [{}])[0].get("message", {}).get("content")
+                body = r.json()
+                usage = body.get("usage") or {}
+                METRICS.inc("llm_tokens_total", usage.get("prompt_tokens", 0), kind="prompt")
+                METRICS.inc("llm_tokens_total", usage.get("completion_tokens", 0), kind="completion")
+                answer = body.get("choices", [{}])[0].get("message", {}).get("content")
                 
                 # 如果没有得到有效回答
                 if not answer:
@@ -172,8 +209,8 @@ class OpenAIParser(Parser):
                 raise api_error
                 
         except Exception as e:
-            # 如果已经是APIError，直接抛出
-            if isinstance(e, APIError):
+            # 如果已经是APIError或已熔断，直接抛出
+            if isinstance(e, (APIError, CircuitOpenError)):
                 raise
                 
             # 否则包装成APIError
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import string
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from models.config import AccountInfo, Config
+from models.movie_info import MovieInfo
+
+# 文件夹命名模板中各字段对应的正则, 未列出的字段（如 video_format、edition）匹配任意文本
+FIELD_PATTERNS = {"title": r'.+?', "year": r'\d{4}'}
+
+
+def folder_name_pattern(pattern: str) -> re.Pattern:
+    """将文件夹命名模板转换为正则表达式, 用于从文件夹名称反推电影信息
+
+    例如 "{title} ({year})" 转换为 ^(?P<title>.+?) \\((?P<year>\\d{4})\\)$
+
+    Args:
+        pattern: 文件夹命名模板
+
+    Returns:
+        re.Pattern: 正则表达式
+
+    Raises:
+        ValueError: 模板中缺少 {title} 或 {year}
+    """
+    parts = []
+    fields = set()
+    for literal, field, _, _ in string.Formatter().parse(pattern):
+        parts.append(re.escape(literal))
+        if field is None:
+            continue
+        if field in fields:
+            parts.append(f"(?P={field})")
+        else:
+            fields.add(field)
+            parts.append(f"(?P<{field}>{FIELD_PATTERNS.get(field, '.*?')})")
+    if not {"title", "year"} <= fields:
+        raise ValueError(f"文件夹命名模板中缺少 {{title}} 或 {{year}}: {pattern}")
+    return re.compile("^" + "".join(parts) + "$")
+
+
+class Reconciler:
+    """根据网盘中已转存的文件夹重建电影数据库
+
+    数据库丢失或落后于网盘时, 并发遍历每个账号的电影文件夹, 按文件夹命名模板反推电影名称和年份,
+    批量写入数据库并记录所属账号. 每个账号记录已处理的最新文件夹修改时间, 下一次只遍历之后新增或修改的文件夹.
+    """
+
+    def __init__(self, config: Config, logger, storage, filter, state_path: str = "data/reconcile.json"):
+        """初始化
+
+        Args:
+            config: 配置对象
+            logger: 日志记录器
+            storage: 存储类
+            filter: 过滤器类
+            state_path: 各账号已处理的最新文件夹修改时间的保存路径
+        """
+        self.config = config
+        self.logger = logger
+        self.storage = storage
+        self.filter = filter(config, logger)
+        self.filter.init_db()
+        self.state_path = state_path
+        self.pattern = folder_name_pattern(config.folder_rename_pattern)
+
+    def _load_state(self) -> Dict[str, str]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as state_file:
+            return json.load(state_file)
+
+    def _save_state(self, state: Dict[str, str]) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def parse_folder_name(self, name: str) -> Optional[MovieInfo]:
+        """按文件夹命名模板解析文件夹名称, 不符合模板时返回None"""
+        match = self.pattern.match(name)
+        if match is None:
+            return None
+        fields = match.groupdict()
+        return MovieInfo(title=fields["title"], year=int(fields["year"]),
+                         video_format=fields.get("video_format") or "", edition=fields.get("edition") or "")
+
+    def _list_account(self, account: AccountInfo, since: str) -> Tuple[str, List[MovieInfo], str, int]:
+        """遍历一个账号的电影文件夹, 在独立的线程和会话中执行
+
+        Returns:
+            tuple: (账号类型, 解析出的电影列表, 最新的文件夹修改时间, 无法解析的文件夹数量)
+        """
+        storage = self.storage(replace(self.config, accounts=[account]), self.logger)
+        account_type, _ = storage.get_current_account_info()
+        movies = []
+        newest = since
+        unmatched = 0
+        for folder in storage.iter_saved_folders(since):
+            newest = max(newest, folder.get("lastOpTime", ""))
+            movie = self.parse_folder_name(folder.get("name", ""))
+            if movie is None:
+                unmatched += 1
+                self.logger.debug("文件夹名称不符合命名模板, 跳过: %s", folder.get("name"))
+                continue
+            movies.append(movie)
+        return account_type, movies, newest, unmatched
+
+    def reconcile(self, full: bool = False) -> Dict[str, dict]:
+        """遍历所有账号并写入数据库
+
+        Args:
+            full: 是否忽略上次记录的修改时间, 重新遍历全部文件夹
+
+        Returns:
+            Dict[str, dict]: 各账号的统计, 包含 folders、added、unmatched, 失败的账号包含 error
+        """
+        state = {} if full else self._load_state()
+        accounts = [account for account in self.config.accounts if account.root_folder]
+        for account in self.config.accounts:
+            if not account.root_folder:
+                self.logger.info(f"账号 {account.username} 尚未创建电影文件夹, 跳过")
+
+        summary = {}
+        if not accounts:
+            return summary
+        with ThreadPoolExecutor(max_workers=len(accounts), thread_name_prefix="reconcile") as executor:
+            futures = {executor.submit(self._list_account, account, state.get(account.username, "")): account
+                       for account in accounts}
+            # 数据库连接只在当前线程中使用, 各账号遍历完成后依次写入
+            for future in as_completed(futures):
+                username = futures[future].username
+                try:
+                    account_type, movies, newest, unmatched = future.result()
+                except Exception as e:
+                    self.logger.error(f"遍历账号 {username} 的电影文件夹失败: {e}")
+                    summary[username] = {"error": str(e)}
+                    continue
+                added = self.filter.record_many([(movie, account_type, username) for movie in movies])
+                state[username] = newest
+                self._save_state(state)
+                summary[username] = {"folders": len(movies) + unmatched, "added": added, "unmatched": unmatched}
+                self.logger.info(f"账号 {username}: 遍历 {len(movies) + unmatched} 个文件夹, "
+                                 f"新增 {added} 部电影, {unmatched} 个文件夹无法解析")
+        return summary
+
+    def close(self) -> None:
+        self.filter.close()
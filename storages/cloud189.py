@@ -1,13 +1,15 @@
 import re
+import threading
 import time
 from dataclasses import dataclass
 
-from Crypto.Cipher import PKCS1_v1_5
-from Crypto.PublicKey import RSA
-
 from models.config import Config
+from models.content import ContentInfo
 from models.storage import Storage
 from utils.base import get_file_ext
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.failure_cache import SHARE_EXPIRED, NO_SPACE
+from utils.metrics import METRICS
 from utils.web import WebRequests
 
 PATTERN = r'https*://cloud\.189\.cn/(?:t/|web/share\?code=)([A-Za-z0-9]+)(?:.*?访问码：([A-Za-z0-9]+))?'
@@ -129,28 +131,60 @@ class Cloud189File:
     fileSize: int
     fileName: str
 
+
+@dataclass
+class Cloud189Share:
+    share_code: str
+    share_id: str
+    access_code: str
+    share_mode: int
+    file: Cloud189File  # 需要转存的文件, 即分享中最大的文件
+
+    @property
+    def key(self) -> str:
+        """不含访问码的分享码, 用作失败记录的键"""
+        return self.share_code.split("（")[0]
+
+    @property
+    def content(self) -> ContentInfo:
+        """需要转存的文件, 用于按内容去重"""
+        return ContentInfo(share_id=self.share_id, file_id=self.file.fileId, file_size=self.file.fileSize,
+                           file_name=self.file.fileName)
+
+
 class Cloud189:
+    # 接口地址和登录认证地址
+    api_url = "https://cloud.189.cn/api"
+    auth_url = "https://open.e.189.cn"
+
     def __init__(self, username, password, logger):
-        self.web = WebRequests(logger=logger)
+        # 每个账号各自熔断, 打开时只停用该账号, 由其他账号继续转存
+        self.web = WebRequests(logger=logger, breaker=get_breaker(f"cloud189:{username}", failure_threshold=5,
+                                                                  reset_timeout=120, failure_statuses=(401, 403),
+                                                                  critical=False, logger=logger))
+        self.logger = logger
         self.username = username
         self.password = password
-        self.api_url = "https://cloud.189.cn/api"
         self.cipher = None
 
     def get_encrypt_config(self):
-        url = "https://open.e.189.cn/api/logbox/config/encryptConf.do"
+        url = f"{self.auth_url}/api/logbox/config/encryptConf.do"
         data = {"appId": "cloud"}
         r = self.web.post(url, data).json()
         return r.get("data")
 
     def get_app_config(self, refer, params):
-        url = "https://open.e.189.cn/api/logbox/oauth2/appConf.do"
+        url = f"{self.auth_url}/api/logbox/oauth2/appConf.do"
         data = {"appKey": "cloud", "version": "2.0"}
-        headers = {"lt": params.get("lt"), "reqid": params.get("reqId"), "Referer": refer, "Origin": "https://open.e.189.cn"}
+        headers = {"lt": params.get("lt"), "reqid": params.get("reqId"), "Referer": refer, "Origin": self.auth_url}
         r = self.web.post(url, data, headers=headers).json()
         return r.get("data")
 
     def init_rsa(self, pubkey):
+        # 只有登录时才需要 pycryptodome
+        from Crypto.Cipher import PKCS1_v1_5
+        from Crypto.PublicKey import RSA
+
         pub = RSA.importKey(f"-----BEGIN PUBLIC KEY-----\n{pubkey}\n-----END PUBLIC KEY-----")
         self.cipher = PKCS1_v1_5.new(pub)
 
@@ -184,7 +218,7 @@ class Cloud189:
             "state": "",
             "paramId": app_config["paramId"]
         }
-        headers = {"lt": params.get("lt"), "reqid": params.get("reqId"), "Referer": refer, "Origin": "https://open.e.189.cn"}
+        headers = {"lt": params.get("lt"), "reqid": params.get("reqId"), "Referer": refer, "Origin": self.auth_url}
         return data, headers
 
     def init_login(self):
@@ -194,12 +228,19 @@ class Cloud189:
 
     def login(self):
         data, headers = self.generate_login_data()
-        url = "https://open.e.189.cn/api/logbox/oauth2/loginSubmit.do"
+        url = f"{self.auth_url}/api/logbox/oauth2/loginSubmit.do"
         r = self.web.post(url, data, headers=headers)
         url = r.json()["toUrl"]
-        r = self.web.post(url, headers={"Referer": "https://open.e.189.cn/"})
+        r = self.web.post(url, headers={"Referer": f"{self.auth_url}/"})
         return r.status_code == 200
 
+    def is_logged_in(self) -> bool:
+        """检查登录状态是否仍然有效"""
+        try:
+            return self.get_size_info() is not None
+        except Exception:
+            return False
+
     def get_size_info(self):
         url = f"{self.api_url}/portal/getUserSizeInfo.action"
         r = self.web.get(url)
@@ -259,6 +300,24 @@ class Cloud189:
             return file_list
         return []
 
+    def list_folders(self, folder_id: str, page_num: int = 1, page_size: int = 100):
+        """分页列出文件夹下的子文件夹, 按修改时间从新到旧排列
+
+        Args:
+            folder_id: 文件夹ID
+            page_num: 页码, 从1开始
+            page_size: 每页数量
+
+        Returns:
+            tuple: (子文件夹列表, 文件和文件夹总数), 请求失败时返回 ([], 0)
+        """
+        url = f"{self.api_url}/open/file/listFiles.action?pageSize={page_size}&pageNum={page_num}&mediaType=0&folderId={folder_id}&iconOption=5&orderBy=lastOpTime&descending=true"
+        r = self.web.get(url)
+        if r.status_code == 200:
+            file_list_ao = r.json().get("fileListAO", {})
+            return file_list_ao.get("folderList", []), file_list_ao.get("count", 0)
+        return [], 0
+
     def rename_file(self, name: str, folder_id: str, file_id: str=None):
         """重命名文件
         
@@ -287,13 +346,13 @@ class Cloud189:
                     )
                     
                 file_id = files[0].get("id")
-                self.logger.debug(f"使用文件夹 {folder_id} 中的第一个文件: {file_id}")
+                self.logger.debug("使用文件夹 %s 中的第一个文件: %s", folder_id, file_id)
                 
             # 执行重命名操作
             url = f"{self.api_url}/open/file/renameFile.action"
             data = {"fileId": file_id, "destFileName": name}
             
-            self.logger.debug(f"重命名文件: {file_id} -> {name}")
+            self.logger.debug("重命名文件: %s -> %s", file_id, name)
             r = self.web.post(url, data=data)
             
             if r.status_code == 200:
@@ -325,6 +384,11 @@ class Cloud189:
 
 
 class Cloud189Storage(Storage):
+    # 转存后等待转存任务完成的时间（秒）
+    save_wait = 2
+    # 遍历文件夹时每页的数量
+    list_page_size = 100
+
     def __init__(self, config: Config, logger):
         self.clients = [Cloud189(username=account.username, password=account.password, logger=logger) for account in config.accounts]
         self.root_folders = [account.root_folder for account in config.accounts]
@@ -333,6 +397,14 @@ class Cloud189Storage(Storage):
         self.current_client_index = 0
         self.logger = logger
         self.config = config
+        # 失败记录, 由收集器设置; 屏蔽期内的分享链接不再查询
+        self.failures = None
+        # 预先创建文件夹时多个线程可能同时创建电影文件夹
+        self.root_lock = threading.Lock()
+        # 预检分享链接的线程和主线程都可能因账号熔断切换账号
+        self.switch_lock = threading.RLock()
+        # 所有账号都熔断时是否终止本次运行; 多账号并行转存时每个存储对象只有一个账号, 由分配器跳过熔断的账号
+        self.abort_when_all_open = True
 
     @property
     def current_client(self):
@@ -340,35 +412,119 @@ class Cloud189Storage(Storage):
 
     @property
     def current_root_folder_id(self):
-        if not self.root_folders[self.current_client_index]:
-            self.config.accounts[self.current_client_index].root_folder = self.root_folders[self.current_client_index] = self.current_client.create_root_folder("电影")
-        return self.root_folders[self.current_client_index]
+        return self._root_folder_id(self.current_client_index)
+
+    def _root_folder_id(self, index: int) -> str:
+        """返回指定账号的电影文件夹ID, 不存在时创建"""
+        if not self.root_folders[index]:
+            with self.root_lock:
+                if not self.root_folders[index]:
+                    self.config.accounts[index].root_folder = self.root_folders[index] = self.clients[index].create_root_folder("电影")
+        return self.root_folders[index]
 
     def switch_client(self):
-        self.current_client_index += 1
-        if self.current_client_index >= self.accounts_num:
-            self.current_client_index = 0
-        self.current_client.login()
+        self._use_available_client(self.current_client_index + 1)
+
+    def _use_available_client(self, start: int) -> None:
+        """从第 start 个账号开始按顺序切换到第一个熔断器未打开的账号
+
+        Args:
+            start: 起始账号序号, 超出账号数量时从头开始
 
-    def save(self, save_path: str, file_name: str, file_info: str):
+        Raises:
+            CircuitOpenError: 所有账号的熔断器都已打开, 终止本次运行
         """
-        转存分享链接
-        
+        with self.switch_lock:
+            errors = []
+            for offset in range(self.accounts_num):
+                index = (start + offset) % self.accounts_num
+                try:
+                    self.clients[index].web.breaker.check()
+                except CircuitOpenError as e:
+                    errors.append(e)
+                    continue
+                if index != self.current_client_index:
+                    if errors:
+                        self.logger.warning(f"跳过已熔断的账号: {', '.join(e.name for e in errors)}")
+                    self.current_client_index = index
+                    self.current_client.login()
+                return
+        if not self.abort_when_all_open:
+            raise errors[0]
+        raise CircuitOpenError("cloud189", min(e.retry_in for e in errors))
+
+    def check_account(self) -> None:
+        """检查当前账号的熔断器
+
+        Raises:
+            CircuitOpenError: 当前账号的熔断器已打开
+        """
+        self.current_client.web.breaker.check()
+
+    def switch_account(self, account_id: str):
+        """切换到指定账号, 用于从断点继续处理时回到转存时使用的账号
+
+        Args:
+            account_id: 账号用户名
+        """
+        if self.current_client.username == account_id:
+            return
+        for index, client in enumerate(self.clients):
+            if client.username == account_id:
+                self.current_client_index = index
+                self.current_client.login()
+                return
+        raise StorageError(f"账号不存在: {account_id}", account=account_id)
+
+    def _mark_failure(self, error: Cloud189Error, key: str, failure: str, record: bool = True) -> Cloud189Error:
+        """在异常中标注失败类型并写入失败记录, 收集器据此屏蔽对应的详情页
+
+        Args:
+            error: 异常
+            key: 不含访问码的分享码
+            failure: 失败类型
+            record: 是否写入失败记录
+
+        Returns:
+            Cloud189Error: 标注后的异常
+        """
+        error.add_detail("failure", failure)
+        if record and self.failures is not None:
+            self.failures.record(key, failure, error.message)
+        return error
+
+    def find_share_link(self, text: str) -> str | None:
+        """从详情页正文中查找天翼云盘分享链接, 不需要调用大模型
+
+        返回统一格式的链接, 同一分享在不同帖子中写法不同（http/https、短链接或网页链接）时得到相同的结果.
+
+        Args:
+            text: 详情页正文文本
+
+        Returns:
+            str | None: 分享链接（含访问码）, 未找到时返回None
+        """
+        match = COMPILE.search(text)
+        if not match:
+            return None
+        share_link = f"https://cloud.189.cn/t/{match.group(1)}"
+        if match.group(2):
+            share_link = f"{share_link}（访问码：{match.group(2)}）"
+        return share_link
+
+    def resolve_share(self, file_info: str) -> Cloud189Share:
+        """解析分享链接并选出需要转存的文件, 只执行只读请求
+
         Args:
-            save_path: 目标文件夹ID
-            file_name: 文件名
             file_info: 分享链接
-            
+
         Returns:
-            Tuple: 文件扩展名和文件ID
-            
+            Cloud189Share: 分享信息
+
         Raises:
             ShareLinkError: 分享链接无效或处理分享链接时出错
-            StorageError: 存储空间不足
-            FileOperationError: 文件操作失败
+            FileOperationError: 获取分享文件列表失败
         """
-        self.logger.info(f"开始处理分享链接: {file_info}")
-        
         # 解析分享链接
         try:
             match = COMPILE.search(file_info)
@@ -376,62 +532,83 @@ class Cloud189Storage(Storage):
                 self.logger.error(f"无效的分享链接格式: {file_info}")
                 raise ShareLinkError(f"获取分享码失败: 链接格式无效 - {file_info}")
                 
-            share_code = match.group(1)
+            share_key = share_code = match.group(1)
             if match.group(2):
                 share_code = f"{share_code}（访问码：{match.group(2)}）"
                 
-            self.logger.debug(f"解析得到分享码: {share_code}")
+            self.logger.debug("解析得到分享码: %s", share_code)
         except Exception as e:
             self.logger.error(f"解析分享链接时出错: {e}")
             raise ShareLinkError(f"解析分享链接时出错: {str(e)}") from e
+
+        # 近期失效或无法转存的分享链接直接跳过
+        failure = self.failures.blocked(share_key) if self.failures is not None else None
+        if failure:
+            self.logger.info(f"分享链接近期处理失败 ({failure}), 跳过: {share_code}")
+            error = ShareLinkError(f"分享链接近期处理失败 ({failure}): {share_code}", share_code=share_code)
+            raise self._mark_failure(error, share_key, failure, record=False)
         
+        # 当前账号已熔断时换用其他账号查询分享
+        self._use_available_client(self.current_client_index)
+
         # 获取分享信息
         try:
-            file, access_code, share_id, share_mode = self.current_client.get_share_info(share_code)
-            if not file:
-                self.logger.error(f"无法获取分享信息: {share_code}")
-                raise ShareLinkError(f"获取分享信息失败: {share_code}")
-                
-            self.logger.debug(f"成功获取分享文件信息: {file.fileName}, 大小: {file.fileSize}")
+            with METRICS.timer("share_info"):
+                file, access_code, share_id, share_mode = self.current_client.get_share_info(share_code)
         except Exception as e:
             self.logger.error(f"获取分享信息失败: {e}")
             raise ShareLinkError(f"获取分享信息失败: {str(e)}") from e
+        if not file or not file.fileId:
+            self.logger.error(f"无法获取分享信息: {share_code}")
+            error = ShareLinkError(f"获取分享信息失败: {share_code}", share_code=share_code)
+            raise self._mark_failure(error, share_key, SHARE_EXPIRED)
+        self.logger.debug("成功获取分享文件信息: %s, 大小: %s", file.fileName, file.fileSize)
             
         # 获取文件列表
         try:
-            files = self.current_client.list_share_dir(file.fileId, access_code, share_id, share_mode)
+            with METRICS.timer("share_list"):
+                files = self.current_client.list_share_dir(file.fileId, access_code, share_id, share_mode)
             if files:
                 max_size_file = max(files, key=lambda f: f.fileSize)
-                self.logger.debug(f"选择最大文件: {max_size_file.fileName}, 大小: {max_size_file.fileSize}")
+                self.logger.debug("选择最大文件: %s, 大小: %s", max_size_file.fileName, max_size_file.fileSize)
             else:
                 max_size_file = file
-                self.logger.debug(f"使用主文件: {max_size_file.fileName}")
-                
-            file_ext = get_file_ext(max_size_file.fileName)
+                self.logger.debug("使用主文件: %s", max_size_file.fileName)
         except Exception as e:
             self.logger.error(f"处理分享文件列表时出错: {e}")
             raise FileOperationError(f"处理分享文件时出错: {str(e)}") from e
+
+        return Cloud189Share(share_code=share_code, share_id=share_id, access_code=access_code,
+                             share_mode=share_mode, file=max_size_file)
+
+    def save(self, save_path: str, file_name: str, file_info: str | Cloud189Share):
+        """
+        转存分享链接
+        
+        Args:
+            save_path: 目标文件夹ID
+            file_name: 文件名
+            file_info: 分享链接, 或已经通过 resolve_share 解析的分享信息
+            
+        Returns:
+            Tuple: 文件扩展名和文件ID
             
+        Raises:
+            ShareLinkError: 分享链接无效或处理分享链接时出错
+            StorageError: 存储空间不足
+            FileOperationError: 文件操作失败
+        """
+        if isinstance(file_info, Cloud189Share):
+            share = file_info
+        else:
+            self.logger.info(f"开始处理分享链接: {file_info}")
+            share = self.resolve_share(file_info)
+        share_id = share.share_id
+        max_size_file = share.file
+        file_ext = get_file_ext(max_size_file.fileName)
+
         # 检查存储空间并在多账号间切换
-        try_times = 0
-        while True:
-            try:
-                if self.has_sufficient_storage(max_size_file):
-                    self.logger.info(f"账号 {self.current_client.username} 空间充足，开始转存")
-                    break
-                    
-                try_times += 1
-                self.logger.warning(f"账号 {self.current_client.username} 空间不足，切换到下一个账号")
-                self.switch_client()
-                
-                if try_times > self.accounts_num:
-                    self.logger.error("所有账号空间均不足，无法继续转存")
-                    raise StorageError(f"所有账号空间均不足，文件大小: {max_size_file.fileSize}")
-            except StorageError:
-                raise
-            except Exception as e:
-                self.logger.error(f"检查存储空间时出错: {e}")
-                raise StorageError(f"检查存储空间时出错: {str(e)}") from e
+        self._switch_to_sufficient_account(share)
             
         # 执行转存操作
         try:
@@ -446,6 +623,7 @@ class Cloud189Storage(Storage):
                 self.logger.error(f"转存失败: {max_size_file.fileName}")
                 raise FileOperationError(f"转存文件失败: {max_size_file.fileName}")
                 
+            METRICS.inc("saved_bytes_total", max_size_file.fileSize or 0, account=self.current_client.username)
             self.logger.info(f"成功转存文件: {file_name}.{file_ext}")
             return file_ext, None
         except Exception as e:
@@ -454,6 +632,57 @@ class Cloud189Storage(Storage):
             self.logger.error(f"转存过程中出错: {e}")
             raise FileOperationError(f"转存过程中出错: {str(e)}") from e
 
+    def select_account(self, share: Cloud189Share) -> str:
+        """在创建文件夹之前选定转存使用的账号, 当前账号空间不足时切换到下一个账号
+
+        转存时使用的文件夹必须属于转存的账号; 跳过熔断器已打开的账号. 只有一个账号时不检查空间, 直接返回当前账号.
+
+        Args:
+            share: 已解析的分享信息
+
+        Returns:
+            str: 选定账号的用户名
+
+        Raises:
+            StorageError: 所有账号空间均不足
+            CircuitOpenError: 所有账号的熔断器都已打开
+        """
+        self._use_available_client(self.current_client_index)
+        if self.accounts_num > 1:
+            self._switch_to_sufficient_account(share)
+        return self.current_client.username
+
+    def _switch_to_sufficient_account(self, share: Cloud189Share) -> None:
+        """检查存储空间并在多账号间切换, 直到当前账号空间充足
+
+        Raises:
+            StorageError: 所有账号空间均不足或检查存储空间时出错
+        """
+        max_size_file = share.file
+        try_times = 0
+        while True:
+            try:
+                with METRICS.timer("space_check"):
+                    sufficient = self.has_sufficient_storage(max_size_file)
+                if sufficient:
+                    self.logger.info(f"账号 {self.current_client.username} 空间充足，开始转存")
+                    break
+                    
+                try_times += 1
+                self.logger.warning(f"账号 {self.current_client.username} 空间不足，切换到下一个账号")
+                self.switch_client()
+                
+                if try_times > self.accounts_num:
+                    self.logger.error("所有账号空间均不足，无法继续转存")
+                    error = StorageError(f"所有账号空间均不足，文件大小: {max_size_file.fileSize}",
+                                         needed_space=max_size_file.fileSize)
+                    raise self._mark_failure(error, share.key, NO_SPACE)
+            except (StorageError, CircuitOpenError):
+                raise
+            except Exception as e:
+                self.logger.error(f"检查存储空间时出错: {e}")
+                raise StorageError(f"检查存储空间时出错: {str(e)}") from e
+
     def has_sufficient_storage(self, file: Cloud189File) -> bool:
         """检查当前账号是否有足够空间存储文件
         
@@ -473,11 +702,11 @@ class Cloud189Storage(Storage):
                 self.logger.error(f"账号 {self.current_client.username} 无法获取存储空间信息")
                 raise StorageError(
                     message="获取剩余空间信息失败",
-                    account=self.current_client.username,
-                    operation="检查存储空间"
+                    account=self.current_client.username
                 )
                 
             available_space = storage_info.get("freeSize", 0)
+            METRICS.set_gauge("account_free_bytes", available_space, account=self.current_client.username)
             needed_space = file.fileSize
             
             # 添加额外的安全边界，确保有足够空间（额外预留10MB）
@@ -513,12 +742,69 @@ class Cloud189Storage(Storage):
         """
         return self.current_client.rename_file(new_name, path, origin_name)
 
-    def create_folder(self, folder_name, parent_folder_path: str=None):
-        return self.current_client.create_folder(folder_name, self.current_root_folder_id)
+    def create_folder(self, folder_name, parent_folder_path: str=None, account_id: str = None):
+        """在账号的电影文件夹下创建文件夹
+
+        Args:
+            folder_name: 文件夹名
+            parent_folder_path: 未使用, 始终创建在电影文件夹下
+            account_id: 账号用户名, 为None时使用当前账号; 在后台线程中创建时指定, 不受主线程切换账号影响
+
+        Returns:
+            str: 文件夹ID
+        """
+        index = self.current_client_index
+        if account_id is not None:
+            index = next((i for i, client in enumerate(self.clients) if client.username == account_id), None)
+            if index is None:
+                raise StorageError(f"账号不存在: {account_id}", account=account_id)
+        return self.clients[index].create_folder(folder_name, self._root_folder_id(index))
+
+    def refresh_session(self):
+        """常驻模式下复用会话前检查登录状态, 失效时重新登录"""
+        if not self.current_client.is_logged_in():
+            self.logger.info(f"账号 {self.current_client.username} 登录已失效, 重新登录")
+            self.current_client.login()
+
+    def get_free_space(self) -> int:
+        """获取当前账号的剩余空间（字节）
+
+        Raises:
+            StorageError: 获取存储空间信息失败
+        """
+        storage_info = self.current_client.get_size_info()
+        if storage_info is None:
+            raise StorageError(message="获取剩余空间信息失败", account=self.current_client.username)
+        free_space = storage_info.get("freeSize", 0)
+        METRICS.set_gauge("account_free_bytes", free_space, account=self.current_client.username)
+        return free_space
 
     def wait_until_save_complete(self, file_name, save_path):
-        time.sleep(2)
+        time.sleep(self.save_wait)
         return
 
+    def iter_saved_folders(self, since: str = ""):
+        """按修改时间从新到旧分页遍历当前账号电影文件夹下的子文件夹
+
+        Args:
+            since: 修改时间下限（如 "2024-01-01 12:00:00"）, 遇到早于此时间的文件夹时停止翻页, 为空时遍历全部
+
+        Yields:
+            dict: 子文件夹信息, 包含 id、name 和 lastOpTime
+        """
+        root_folder = self.root_folders[self.current_client_index]
+        if not root_folder:
+            return
+        page_num = 1
+        while True:
+            folders, count = self.current_client.list_folders(root_folder, page_num, self.list_page_size)
+            for folder in folders:
+                if since and folder.get("lastOpTime", "") < since:
+                    return
+                yield folder
+            if not folders or page_num * self.list_page_size >= count:
+                return
+            page_num += 1
+
     def get_current_account_info(self):
         return "Cloud189", self.current_client.username
\ No newline at end of file
@@ -0,0 +1,173 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Deque, Tuple, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 录制模式和回放模式
+RECORD = "record"
+REPLAY = "replay"
+
+# 不写入录制文件的响应头
+SKIPPED_HEADERS = {"set-cookie", "content-encoding", "transfer-encoding", "content-length"}
+
+
+class CassetteMissError(Exception):
+    """回放时找不到对应的录制记录"""
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        super().__init__(f"录制文件中没有对应的请求: {method.upper()} {url}")
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _body_key(kwargs: dict) -> str:
+    """计算请求体的摘要, 请求体本身（可能包含密码、令牌）不会写入录制文件"""
+    body = kwargs.get("json")
+    if body is None:
+        body = kwargs.get("data")
+    if body is None:
+        return ""
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha1(body).hexdigest()
+
+
+class Cassette:
+    """HTTP 请求录制/回放
+
+    录制模式下把每个请求的响应追加写入 JSON Lines 文件（以 .gz 结尾时使用 gzip 压缩）;
+    回放模式下按 (方法, URL, 请求体摘要) 依次返回录制的响应, 可选按原始耗时等待,
+    从而离线重现一次真实运行, 用于性能分析和回归测试.
+    """
+
+    def __init__(self, path: str, mode: str, simulate_latency: bool = False, latency_scale: float = 1.0,
+                 logger=None):
+        """初始化录制文件
+
+        Args:
+            path: 录制文件路径
+            mode: record 或 replay
+            simulate_latency: 回放时是否按录制时的耗时等待
+            latency_scale: 回放等待时间的缩放系数
+            logger: 日志记录器
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"不支持的录制模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.latency_scale = latency_scale
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.file = None
+        self.by_url: Dict[Tuple[str, str], Deque[dict]] = defaultdict(deque)
+        self.last: Dict[Tuple[str, str], dict] = {}
+
+        if mode == RECORD:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = _open(path, "a")
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        count = 0
+        with _open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                self.by_url[(item["method"], item["url"])].append(item)
+                count += 1
+        if self.logger is not None:
+            self.logger.info(f"已加载录制文件 {self.path}, 共 {count} 条请求")
+
+    def record(self, method: str, url: str, kwargs: dict, response: requests.Response, elapsed: float) -> None:
+        """录制一次请求的响应
+
+        Args:
+            method: 请求方法
+            url: 请求URL
+            kwargs: 请求参数
+            response: 响应对象
+            elapsed: 请求耗时（秒）
+        """
+        item = {
+            "method": method.upper(),
+            "url": url,
+            "body": _body_key(kwargs),
+            "status": response.status_code,
+            "reason": response.reason,
+            "final_url": response.url,
+            "headers": {key: value for key, value in response.headers.items() if key.lower() not in SKIPPED_HEADERS},
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "elapsed": elapsed,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(item, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def _next(self, method: str, url: str, body: str) -> Optional[dict]:
+        """按录制顺序取出下一条匹配的记录, 记录用完后重复使用最后一条"""
+        with self.lock:
+            queue = self.by_url.get((method, url))
+            if not queue:
+                return self.last.get((method, url))
+            # 优先匹配请求体相同的记录; 请求体中带有随机内容（如登录时的加密参数）时按录制顺序匹配
+            index = next((i for i, item in enumerate(queue) if item["body"] == body), 0)
+            item = queue[index]
+            del queue[index]
+            self.last[(method, url)] = item
+            return item
+
+    def replay(self, method: str, url: str, kwargs: dict) -> requests.Response:
+        """回放一次请求
+
+        Args:
+            method: 请求方法
+            url: 请求URL
+            kwargs: 请求参数
+
+        Returns:
+            requests.Response: 录制的响应
+
+        Raises:
+            CassetteMissError: 录制文件中没有对应的请求
+        """
+        item = self._next(method.upper(), url, _body_key(kwargs))
+        if item is None:
+            raise CassetteMissError(method, url)
+
+        if self.simulate_latency:
+            time.sleep(item["elapsed"] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = item["status"]
+        response.reason = item.get("reason")
+        response.url = item.get("final_url") or url
+        response.headers = CaseInsensitiveDict(item["headers"])
+        response._content = base64.b64decode(item["content"])
+        return response
+
+    def close(self) -> None:
+        if self.file is not None:
+            with self.lock:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from typing import Dict, Tuple, Optional
+
+from utils.metrics import METRICS
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器已打开, 请求未发出"""
+
+    def __init__(self, name: str, retry_in: float, critical: bool = True):
+        """
+        Args:
+            name: 熔断器名称
+            retry_in: 多久之后进入半开状态（秒）
+            critical: 是否终止整个运行, 单个账号熔断时为False, 只停用该账号
+        """
+        self.name = name
+        self.retry_in = retry_in
+        self.critical = critical
+        super().__init__(f"{name} 已熔断, {retry_in:.0f}秒后重试")
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到阈值后打开, 之后的请求直接抛出 CircuitOpenError, 不再等待超时和重试;
+    打开一段时间后进入半开状态, 只放行一个探测请求, 探测成功则关闭, 失败则重新打开.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0,
+                 failure_statuses: Tuple[int, ...] = (), critical: bool = True, logger=None):
+        """初始化熔断器
+
+        Args:
+            name: 名称, 如 leijing、llm、cloud189:<账号>
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 打开后多久进入半开状态（秒）
+            failure_statuses: 除 5xx 以外视为依赖故障的响应状态码, 如 401、403
+            critical: 打开时是否终止整个运行; 单个账号等可以由其他实例替代的依赖为False, 只停用该实例
+            logger: 日志记录器
+        """
+        self.name = name
+        self.critical = critical
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_statuses = failure_statuses
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def is_failure_status(self, status_code: int) -> bool:
+        """判断响应状态码是否表示依赖故障"""
+        return status_code >= 500 or status_code in self.failure_statuses
+
+    def before_call(self) -> None:
+        """请求前检查, 熔断器打开时抛出异常
+
+        Raises:
+            CircuitOpenError: 熔断器已打开, 或半开状态下已有探测请求
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self.opened_at + self.reset_timeout - time.time()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+        raise CircuitOpenError(self.name, max(retry_in, 0), self.critical)
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.logger.info(f"{self.name} 探测成功, 熔断器关闭")
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.time()
+                METRICS.inc("circuit_breaker_trips_total", breaker=self.name)
+                self.logger.warning(f"{self.name} 连续失败 {self.failures} 次, 熔断器打开, {self.reset_timeout:.0f}秒后重试")
+
+    def check(self) -> None:
+        """熔断器打开且未到半开时间时抛出异常, 不占用半开状态的探测机会
+
+        Raises:
+            CircuitOpenError: 熔断器已打开
+        """
+        with self.lock:
+            retry_in = self.opened_at + self.reset_timeout - time.time()
+            if self.state != OPEN or retry_in <= 0:
+                return
+        raise CircuitOpenError(self.name, retry_in, self.critical)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"state": self.state, "failures": self.failures,
+                    "opened_at": self.opened_at if self.state != CLOSED else None}
+
+
+# 全局熔断器, 按依赖名称共享, 常驻模式下跨运行保留状态
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """获取指定依赖的熔断器, 不存在时创建
+
+    Args:
+        name: 名称
+        **kwargs: 创建时传给 CircuitBreaker 的参数
+
+    Returns:
+        CircuitBreaker: 熔断器
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+
+def find_open_circuit(error: BaseException) -> Optional[CircuitOpenError]:
+    """沿异常链查找 CircuitOpenError, 存储等模块会把底层异常包装成自己的异常类型
+
+    Args:
+        error: 异常
+
+    Returns:
+        Optional[CircuitOpenError]: 找到时返回熔断异常, 否则返回None
+    """
+    while error is not None:
+        if isinstance(error, CircuitOpenError):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def check_breakers() -> None:
+    """任一会终止整个运行的熔断器处于打开状态时抛出异常, 用于在运行开始前跳过注定失败的工作;
+    单个账号的熔断器打开时只停用该账号, 不在这里检查
+
+    Raises:
+        CircuitOpenError: 熔断器已打开
+    """
+    with _breakers_lock:
+        breakers = [breaker for breaker in _breakers.values() if breaker.critical]
+    for breaker in breakers:
+        breaker.check()
+
+
+def breaker_states() -> Dict[str, dict]:
+    """返回所有熔断器的状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.to_dict() for breaker in breakers}
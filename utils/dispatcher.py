@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, List
+
+from storages.cloud189 import StorageError
+from utils.circuit_breaker import CircuitOpenError
+from utils.failure_cache import NO_SPACE
+
+
+class AccountWorker:
+    """单个账号的转存工作线程, 独占该账号已登录的会话"""
+
+    def __init__(self, storage, logger):
+        """初始化工作线程
+
+        Args:
+            storage: 只包含一个账号的存储对象
+            logger: 日志记录器
+        """
+        self.storage = storage
+        self.account_type, self.account_id = storage.get_current_account_info()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"save-{self.account_id}")
+        self.free_space = storage.get_free_space()
+        self.inflight = 0
+        logger.info(f"账号 {self.account_id} 剩余空间: {self.free_space / (1024 * 1024 * 1024):.2f}GB")
+
+
+class SaveDispatcher:
+    """按账号剩余空间分配转存任务, 各账号的工作线程并行转存"""
+
+    # 额外预留的安全空间（字节）, 与 Cloud189Storage.has_sufficient_storage 保持一致
+    reserved_space = 10 * 1024 * 1024
+
+    def __init__(self, storages: List, logger, max_pending: int = 2):
+        """初始化分配器
+
+        Args:
+            storages: 每个账号各自的存储对象
+            logger: 日志记录器
+            max_pending: 每个账号同时排队和执行中的任务上限
+        """
+        self.logger = logger
+        self.max_pending = max_pending
+        self.workers = [AccountWorker(storage, logger) for storage in storages]
+        self.condition = threading.Condition()
+
+    def _pick_worker(self, size: int) -> AccountWorker | None:
+        """选出空闲且剩余空间最多的账号, 跳过熔断器已打开的账号, 所有可用账号都繁忙时返回None
+
+        Raises:
+            StorageError: 所有账号空间均不足
+            CircuitOpenError: 空间充足的账号都已熔断
+        """
+        candidates = [worker for worker in self.workers if worker.free_space > size + self.reserved_space]
+        if not candidates:
+            error = StorageError(f"所有账号空间均不足，文件大小: {size}", needed_space=size)
+            error.add_detail("failure", NO_SPACE)
+            raise error
+        available = []
+        retry_in = []
+        for worker in candidates:
+            try:
+                worker.storage.check_account()
+            except CircuitOpenError as e:
+                retry_in.append(e.retry_in)
+                continue
+            available.append(worker)
+        if not available:
+            raise CircuitOpenError("cloud189", min(retry_in))
+        idle = [worker for worker in available if worker.inflight < self.max_pending]
+        if not idle:
+            return None
+        return max(idle, key=lambda worker: worker.free_space)
+
+    def submit(self, size: int, fn: Callable, *args) -> Future:
+        """分配任务到合适的账号, 所有可用账号都繁忙时阻塞等待
+
+        Args:
+            size: 需要转存的文件大小（字节）
+            fn: 任务函数, 第一个参数为账号对应的存储对象
+            *args: 任务函数的其他参数
+
+        Returns:
+            Future: 任务结果
+        """
+        with self.condition:
+            worker = self._pick_worker(size)
+            while worker is None:
+                self.condition.wait()
+                worker = self._pick_worker(size)
+            worker.inflight += 1
+            worker.free_space -= size
+
+        self.logger.debug("分配任务到账号 %s, 文件大小: %s", worker.account_id, size)
+        future = worker.executor.submit(fn, worker.storage, *args)
+        future.add_done_callback(lambda done: self._release(worker, size, done))
+        return future
+
+    def _release(self, worker: AccountWorker, size: int, future: Future) -> None:
+        """任务结束后释放账号, 转存失败时归还预留的空间
+
+        剩余空间指标由存储对象在检查空间时按用户名更新, 这里只维护分配用的预留空间
+        """
+        with self.condition:
+            worker.inflight -= 1
+            if future.cancelled() or future.exception() is not None:
+                worker.free_space += size
+            self.condition.notify_all()
+
+    def refresh(self) -> None:
+        """在各账号自己的工作线程中刷新会话和剩余空间"""
+        def _refresh(worker: AccountWorker) -> None:
+            worker.storage.refresh_session()
+            worker.free_space = worker.storage.get_free_space()
+
+        futures = [worker.executor.submit(_refresh, worker) for worker in self.workers]
+        for future in futures:
+            future.result()
+
+    def shutdown(self) -> None:
+        """等待所有任务完成并关闭工作线程"""
+        for worker in self.workers:
+            worker.executor.shutdown(wait=True)
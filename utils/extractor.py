@@ -0,0 +1,109 @@
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+
+@lru_cache(maxsize=None)
+def compile_selector(expression: str) -> etree.XPath:
+    """编译 XPath 选择器, 相同的表达式只编译一次
+
+    返回普通字符串而不是带父节点引用的 smart string, 结果不会让整棵文档树继续留在内存中.
+
+    Args:
+        expression: XPath 表达式
+
+    Returns:
+        etree.XPath: 编译后的选择器
+
+    Raises:
+        ValueError: 表达式语法错误
+    """
+    try:
+        return etree.XPath(expression, smart_strings=False)
+    except etree.XPathSyntaxError as e:
+        raise ValueError(f"选择器语法错误: {expression}, {e}") from e
+
+
+def declared_encoding(response) -> Optional[str]:
+    """返回响应头中声明的编码, 未声明时返回None
+
+    requests 在未声明编码时会按 ISO-8859-1 解码或逐字节猜测编码, 此时应交给 lxml 按页面内容识别.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    return response.encoding if "charset" in content_type.lower() else None
+
+
+class PageExtractor:
+    """按选择器配置从页面中提取内容
+
+    选择器配置为 名称 -> XPath 表达式 的字典, 选择器应选择属性或文本节点, 创建时全部编译; 站点改版时只需修改配置.
+    解析时复用每个线程各自的 HTML 解析器, 并丢弃注释和处理指令, 不建立 id 索引.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, selectors: Dict[str, str]):
+        """初始化并编译所有选择器
+
+        Args:
+            selectors: 选择器配置
+
+        Raises:
+            ValueError: 选择器语法错误
+        """
+        self.selectors = {name: compile_selector(expression) for name, expression in selectors.items()}
+
+    @classmethod
+    def _parser(cls, encoding: Optional[str]) -> etree.HTMLParser:
+        # lxml 的解析器不能在多个线程间共享, 每个线程按编码各保留一个
+        parsers = getattr(cls._local, "parsers", None)
+        if parsers is None:
+            parsers = cls._local.parsers = {}
+        if encoding not in parsers:
+            parsers[encoding] = etree.HTMLParser(encoding=encoding, remove_blank_text=True, remove_comments=True,
+                                                 remove_pis=True, collect_ids=False)
+        return parsers[encoding]
+
+    def parse(self, content: str | bytes, encoding: Optional[str] = None):
+        """解析 HTML
+
+        直接解析响应的原始字节, 省去先解码为字符串的开销; 未指定编码时由 lxml 按页面中的 meta 标签识别.
+
+        Args:
+            content: HTML 字节或文本
+            encoding: 字节内容的编码, 为None时自动识别
+
+        Returns:
+            文档根节点, 内容为空时返回None
+        """
+        if isinstance(content, str):
+            encoding = None
+        return etree.HTML(content, self._parser(encoding))
+
+    def values(self, root, name: str) -> List[str]:
+        """执行选择器并返回匹配到的字符串, 如属性值或文本节点
+
+        Args:
+            root: 文档根节点
+            name: 选择器名称
+
+        Returns:
+            List[str]: 匹配结果, 根节点为None时返回空列表
+        """
+        if root is None:
+            return []
+        return self.selectors[name](root)
+
+    def text(self, root, name: str) -> str:
+        """执行选择器并将匹配到的非空文本逐行拼接
+
+        Args:
+            root: 文档根节点
+            name: 选择器名称
+
+        Returns:
+            str: 拼接后的文本, 没有匹配时返回空字符串
+        """
+        return '\n'.join(value.strip() for value in self.values(root, name) if value.strip())
@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import METRICS
+
+# 失败类型
+PARSE_FAILED = "parse_failed"  # 大模型无法从详情页提取电影信息
+FETCH_FAILED = "fetch_failed"  # 详情页请求失败或页面结构异常
+SHARE_EXPIRED = "share_expired"  # 分享链接失效或无法获取分享信息
+NO_SPACE = "no_space"  # 所有账号空间均不足
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class FailureCache:
+    """失败记录（负缓存）
+
+    按详情页链接和分享码记录最近的失败及其类型. 每种类型有各自的初始屏蔽时间,
+    连续失败时按指数退避延长, 屏蔽期间爬虫和存储直接跳过, 不再重复请求详情页、调用大模型或查询分享信息.
+    """
+
+    # 各失败类型的初始屏蔽时间和最长屏蔽时间（秒）
+    ttls: Dict[str, Tuple[float, float]] = {
+        PARSE_FAILED: (DAY, 30 * DAY),
+        FETCH_FAILED: (HOUR, DAY),
+        SHARE_EXPIRED: (3 * DAY, 30 * DAY),
+        NO_SPACE: (6 * HOUR, DAY),
+    }
+    # 未知失败类型的屏蔽时间（秒）
+    default_ttl = (HOUR, DAY)
+    # 屏蔽结束后失败记录的保留时间（秒）, 保留期间再次失败会继续退避
+    retention = 30 * DAY
+
+    def __init__(self, logger, db_path: str = 'data/failures.db'):
+        """初始化失败记录
+
+        Args:
+            logger: 日志记录器
+            db_path: 数据库文件路径
+        """
+        self.logger = logger
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS failures (
+                key TEXT PRIMARY KEY,
+                failure TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT NULL,
+                first_failed_at REAL NOT NULL,
+                last_failed_at REAL NOT NULL,
+                retry_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def blocked(self, key: str) -> Optional[str]:
+        """判断链接或分享码是否仍在屏蔽期内
+
+        Args:
+            key: 详情页链接或分享码
+
+        Returns:
+            Optional[str]: 屏蔽期内返回失败类型, 否则返回None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'select failure from failures where key = ? and retry_at > ?', [key, time.time()]
+            ).fetchone()
+        if row is None:
+            return None
+        METRICS.inc("negative_cache_hits_total", failure=row[0])
+        return row[0]
+
+    def record(self, key: str, failure: str, error: str = "") -> float:
+        """记录一次失败, 连续失败时屏蔽时间按指数增长
+
+        Args:
+            key: 详情页链接或分享码
+            failure: 失败类型
+            error: 错误信息
+
+        Returns:
+            float: 屏蔽时间（秒）
+        """
+        base, cap = self.ttls.get(failure, self.default_ttl)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('select attempts from failures where key = ?', [key]).fetchone()
+            attempts = row[0] + 1 if row else 1
+            ttl = min(base * 2 ** (attempts - 1), cap)
+            self.conn.execute(
+                'insert into failures (key, failure, attempts, error, first_failed_at, last_failed_at, retry_at) '
+                'values (?, ?, ?, ?, ?, ?, ?) '
+                'on conflict(key) do update set failure = excluded.failure, attempts = excluded.attempts, '
+                'error = excluded.error, last_failed_at = excluded.last_failed_at, retry_at = excluded.retry_at',
+                [key, failure, attempts, error, now, now, now + ttl]
+            )
+            self.conn.commit()
+        self.logger.info(f"记录失败 [{failure}] 第{attempts}次, {ttl / HOUR:.1f}小时内跳过: {key}")
+        return ttl
+
+    def clear(self, key: str) -> None:
+        """处理成功后清除失败记录"""
+        with self.lock:
+            self.conn.execute('delete from failures where key = ?', [key])
+            self.conn.commit()
+
+    def prune(self) -> None:
+        """清理屏蔽结束超过保留时间的失败记录"""
+        with self.lock:
+            self.conn.execute('delete from failures where retry_at < ?', [time.time() - self.retention])
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.job import Job, DISCOVERED, RESUMABLE_STATES, FINISHED_STATES
+from models.movie_info import MovieInfo
+
+
+class JobQueue:
+    """持久化任务队列
+
+    每个详情页对应一条任务, 任务状态依次为 discovered -> parsed -> saved -> renamed -> recorded,
+    每次状态变更都会立即提交, 进程意外退出后可以从最后一个检查点继续处理,
+    不会重复调用大模型或重复转存.
+    已解析的任务转存时遇到临时错误会保持当前状态, 按指数退避安排下一次重试, 到期前不会被恢复.
+    """
+
+    # 已完成任务的保留时间（秒）, 超时后清理
+    retention = 30 * 24 * 3600
+    # 转存重试的初始等待时间和最长等待时间（秒）
+    retry_delay: Tuple[float, float] = (5 * 60, 6 * 3600)
+    # 最多尝试转存的次数, 超过后标记为 failed
+    max_attempts = 5
+
+    def __init__(self, logger, db_path: str = 'data/jobs.db'):
+        """初始化任务队列
+
+        Args:
+            logger: 日志记录器
+            db_path: 数据库文件路径
+        """
+        self.logger = logger
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                movie_info TEXT NULL,
+                share_link TEXT NULL,
+                folder_id TEXT NULL,
+                file_ext TEXT NULL,
+                file_id TEXT NULL,
+                account_id TEXT NULL,
+                error TEXT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        # 兼容没有重试字段的旧数据库
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')}
+        if 'attempts' not in columns:
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN next_attempt_at REAL NULL')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)')
+        # 常规运行时各列表页的指纹, 用于发现没有变化的列表页
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS listings (
+                source TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, page)
+            )
+        ''')
+        # 回填时已处理完的列表页
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                source TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                urls INTEGER NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (source, page)
+            )
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def _to_job(row) -> Job:
+        url, state, movie_info, share_link, folder_id, file_ext, file_id, account_id, error, attempts = row
+        return Job(
+            url=url,
+            state=state,
+            movie_info=MovieInfo(**json.loads(movie_info)) if movie_info else None,
+            share_link=share_link,
+            folder_id=folder_id,
+            file_ext=file_ext,
+            file_id=file_id,
+            account_id=account_id,
+            error=error,
+            attempts=attempts
+        )
+
+    def get(self, url: str) -> Optional[Job]:
+        """获取指定详情页的任务
+
+        Args:
+            url: 详情页链接
+
+        Returns:
+            Optional[Job]: 任务, 不存在时返回None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'select url, state, movie_info, share_link, folder_id, file_ext, file_id, account_id, error, attempts '
+                'from jobs where url = ?', [url]
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def pending(self) -> List[Job]:
+        """获取所有未完成且已到重试时间的任务, 按创建顺序排列
+
+        Returns:
+            List[Job]: 可继续处理的任务列表
+        """
+        placeholders = ', '.join('?' * len(RESUMABLE_STATES))
+        with self.lock:
+            rows = self.conn.execute(
+                'select url, state, movie_info, share_link, folder_id, file_ext, file_id, account_id, error, attempts '
+                f'from jobs where state in ({placeholders}) and (next_attempt_at is null or next_attempt_at <= ?) '
+                'order by created_at', [*RESUMABLE_STATES, time.time()]
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """返回各状态的任务数量"""
+        with self.lock:
+            rows = self.conn.execute('select state, count(*) from jobs group by state').fetchall()
+        return dict(rows)
+
+    def waiting(self) -> int:
+        """返回等待重试时间到期的任务数量"""
+        with self.lock:
+            row = self.conn.execute('select count(*) from jobs where next_attempt_at > ?', [time.time()]).fetchone()
+        return row[0]
+
+    def is_finished(self, url: str) -> bool:
+        """判断详情页是否已经处理完毕"""
+        job = self.get(url)
+        return job is not None and job.state in FINISHED_STATES
+
+    def discover(self, urls: List[str], listings: Iterable[Tuple[str, int, str]] = ()) -> List[Job]:
+        """登记新发现的详情页, 已存在时重置为 discovered 状态; 同时保存列表页的指纹, 在同一个事务中提交
+
+        列表页的指纹只能在该页的详情页都登记为任务之后保存, 否则中断后再次运行时会认为列表页没有变化而停止翻页,
+        之后列表页中从未登记的详情页就再也不会被处理.
+
+        Args:
+            urls: 详情页链接列表
+            listings: (列表页来源, 页码, 指纹) 列表
+
+        Returns:
+            List[Job]: 新任务
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                'insert into jobs (url, state, created_at, updated_at) values (?, ?, ?, ?) '
+                'on conflict(url) do update set state = excluded.state, movie_info = null, share_link = null, '
+                'folder_id = null, file_ext = null, file_id = null, account_id = null, error = null, '
+                'attempts = 0, next_attempt_at = null, updated_at = excluded.updated_at',
+                [[url, DISCOVERED, now, now] for url in urls]
+            )
+            self.conn.executemany(
+                'insert or replace into listings (source, page, fingerprint, updated_at) values (?, ?, ?, ?)',
+                [[source, page, fingerprint, now] for source, page, fingerprint in listings]
+            )
+            self.conn.commit()
+        return [Job(url) for url in urls]
+
+    def update(self, job: Job, state: str, **fields) -> Job:
+        """更新任务状态并立即提交
+
+        Args:
+            job: 任务
+            state: 新状态
+            **fields: 需要同时更新的任务字段
+
+        Returns:
+            Job: 更新后的任务
+        """
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.state = state
+        with self.lock:
+            self.conn.execute(
+                'update jobs set state = ?, movie_info = ?, share_link = ?, folder_id = ?, file_ext = ?, '
+                'file_id = ?, account_id = ?, error = ?, next_attempt_at = null, updated_at = ? where url = ?',
+                [job.state, json.dumps(asdict(job.movie_info), ensure_ascii=False) if job.movie_info else None,
+                 job.share_link, job.folder_id, job.file_ext, job.file_id, job.account_id, job.error,
+                 time.time(), job.url]
+            )
+            self.conn.commit()
+        return job
+
+    def retry(self, job: Job, error: str) -> Optional[float]:
+        """安排转存失败的任务稍后重试, 任务保持当前状态, 重试时从最后一个检查点继续
+
+        Args:
+            job: 已解析的任务
+            error: 错误信息
+
+        Returns:
+            Optional[float]: 距离下一次重试的时间（秒）, 已达到最多尝试次数时返回None, 任务不做修改
+        """
+        attempts = job.attempts + 1
+        if attempts >= self.max_attempts:
+            return None
+        base, cap = self.retry_delay
+        delay = min(base * 2 ** (attempts - 1), cap)
+        now = time.time()
+        job.attempts = attempts
+        job.error = error
+        with self.lock:
+            self.conn.execute(
+                'update jobs set attempts = ?, next_attempt_at = ?, error = ?, updated_at = ? where url = ?',
+                [attempts, now + delay, error, now, job.url]
+            )
+            self.conn.commit()
+        return delay
+
+    def listing_unchanged(self, source: str, page: int, fingerprint: str) -> bool:
+        """判断列表页与上次保存的指纹是否相同, 指纹由 discover 在登记详情页时保存
+
+        Args:
+            source: 列表页来源
+            page: 页码
+            fingerprint: 列表页中按顺序排列的详情页链接的指纹
+
+        Returns:
+            bool: 列表页与上次爬取时相同时返回True
+        """
+        with self.lock:
+            row = self.conn.execute('select fingerprint from listings where source = ? and page = ?',
+                                    [source, page]).fetchone()
+        return row is not None and row[0] == fingerprint
+
+    def page_finished(self, source: str, page: int) -> bool:
+        """判断回填时列表页是否已经处理完
+
+        Args:
+            source: 列表页来源, 如带标签ID的列表页地址
+            page: 页码
+        """
+        with self.lock:
+            row = self.conn.execute('select 1 from pages where source = ? and page = ?', [source, page]).fetchone()
+        return row is not None
+
+    def finish_page(self, source: str, page: int, urls: int) -> None:
+        """记录回填时已处理完的列表页
+
+        Args:
+            source: 列表页来源
+            page: 页码
+            urls: 列表页中的详情页数量
+        """
+        with self.lock:
+            self.conn.execute(
+                'insert or replace into pages (source, page, urls, finished_at) values (?, ?, ?, ?)',
+                [source, page, urls, time.time()]
+            )
+            self.conn.commit()
+
+    def prune(self) -> None:
+        """清理超过保留时间的已完成任务"""
+        placeholders = ', '.join('?' * len(FINISHED_STATES))
+        with self.lock:
+            self.conn.execute(
+                f'delete from jobs where state in ({placeholders}) and updated_at < ?',
+                [*FINISHED_STATES, time.time() - self.retention]
+            )
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
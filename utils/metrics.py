@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, Iterator
+
+# 耗时直方图的分桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prometheus 指标名前缀
+PREFIX = "automoviesaver"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """累计分桶直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)},
+        }
+
+
+class Metrics:
+    """运行指标: 计数器、当前值和耗时直方图, 线程安全
+
+    各阶段（crawl、parse、filter、create_folder、save、wait、rename 等）的耗时通过 ``timer`` 记录,
+    所有对外 HTTP 请求由 ``WebRequests`` 通过 ``observe_http`` 记录.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def reset(self) -> None:
+        """清空计数器和直方图, 每次运行开始时调用
+
+        当前值（如各账号的剩余空间）保留上一次的值, 状态服务在本次运行更新之前仍能显示
+        """
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """增加计数器
+
+        Args:
+            name: 指标名
+            value: 增加的值
+            **labels: 标签
+        """
+        key = self._labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """设置当前值, 如账号剩余空间
+
+        Args:
+            name: 指标名
+            value: 当前值
+            **labels: 标签
+        """
+        key = self._labels(labels)
+        with self.lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def gauge_by(self, name: str, label: str) -> Dict[str, float]:
+        """按一个标签返回当前值, 如各账号的剩余空间"""
+        with self.lock:
+            return {dict(key).get(label, ""): value for key, value in self.gauges.get(name, {}).items()}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录一次直方图观测值
+
+        Args:
+            name: 指标名
+            value: 观测值
+            **labels: 标签
+        """
+        key = self._labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """记录一个阶段的墙钟耗时和当前线程的 CPU 耗时
+
+        Args:
+            stage: 阶段名称
+        """
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+            self.inc("stage_cpu_seconds_total", time.thread_time() - cpu_start, stage=stage)
+            self.inc("stage_total", stage=stage, status=status)
+
+    def observe_http(self, host: str, method: str, status, seconds: float) -> None:
+        """记录一次对外 HTTP 请求
+
+        Args:
+            host: 请求的主机
+            method: 请求方法
+            status: 响应状态码, 请求异常时为 error
+            seconds: 请求耗时（秒）
+        """
+        self.observe("http_request_seconds", seconds, host=host, method=method.upper())
+        self.inc("http_requests_total", host=host, method=method.upper(), status=status)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """获取计数器的值, 只指定部分标签时返回所有匹配序列的和"""
+        with self.lock:
+            series = self.counters.get(name, {})
+            return sum(value for key, value in series.items()
+                       if all((label, str(expected)) in key for label, expected in labels.items()))
+
+    def counter_by(self, name: str, label: str) -> Dict[str, float]:
+        """按一个标签汇总计数器, 如各主机的请求次数"""
+        totals: Dict[str, float] = {}
+        with self.lock:
+            for key, value in self.counters.get(name, {}).items():
+                group = dict(key).get(label, "")
+                totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def histogram_by(self, name: str, label: str) -> Dict[str, Histogram]:
+        """按一个标签合并直方图, 如各主机的请求耗时"""
+        merged: Dict[str, Histogram] = {}
+        with self.lock:
+            for key, histogram in self.histograms.get(name, {}).items():
+                group = merged.setdefault(dict(key).get(label, ""), Histogram(histogram.buckets))
+                group.count += histogram.count
+                group.sum += histogram.sum
+                group.bucket_counts = [a + b for a, b in zip(group.bucket_counts, histogram.bucket_counts)]
+                for value in (histogram.min, histogram.max):
+                    if value is not None:
+                        group.min = value if group.min is None else min(group.min, value)
+                        group.max = value if group.max is None else max(group.max, value)
+        return merged
+
+    def snapshot(self) -> dict:
+        """返回所有指标的快照"""
+        def labels_to_str(labels: Labels) -> str:
+            return ",".join(f"{key}={value}" for key, value in labels) or "_"
+
+        with self.lock:
+            return {
+                "counters": {name: {labels_to_str(key): value for key, value in series.items()}
+                             for name, series in self.counters.items()},
+                "gauges": {name: {labels_to_str(key): value for key, value in series.items()}
+                           for name, series in self.gauges.items()},
+                "histograms": {name: {labels_to_str(key): histogram.to_dict() for key, histogram in series.items()}
+                               for name, series in self.histograms.items()},
+            }
+
+    def stages(self) -> Dict[str, dict]:
+        """返回各阶段的耗时汇总, 包括墙钟耗时和 CPU 耗时"""
+        with self.lock:
+            cpu = {dict(key)["stage"]: value for key, value in self.counters.get("stage_cpu_seconds_total", {}).items()}
+            return {dict(key)["stage"]: {**histogram.to_dict(), "cpu_seconds": cpu.get(dict(key)["stage"], 0.0)}
+                    for key, histogram in sorted(self.histograms.get("stage_seconds", {}).items())}
+
+    def to_prometheus(self) -> str:
+        """按 Prometheus 文本格式导出指标"""
+        def fmt(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{fmt(labels)} {value}")
+            for name, series in sorted(self.gauges.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{fmt(labels)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{metric}_bucket{fmt(labels, (('le', str(bound)),))} {count}")
+                    lines.append(f"{metric}_bucket{fmt(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{metric}_sum{fmt(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{fmt(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str, extra: dict = None) -> None:
+        """将本次运行的指标写入 JSON 报告
+
+        Args:
+            path: 报告文件路径
+            extra: 需要一并写入的其他信息, 如运行时间和处理数量
+        """
+        report = {**(extra or {}), "stages": self.stages(), **self.snapshot()}
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        """写入 Prometheus textfile, 供 node_exporter 的 textfile collector 采集
+
+        Args:
+            path: 文件路径
+        """
+        _atomic_write(path, self.to_prometheus())
+
+
+def _atomic_write(path: str, content: str) -> None:
+    """先写入临时文件再替换, 避免读取方读到写了一半的文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# 全局指标, 由各模块共享
+METRICS = Metrics()
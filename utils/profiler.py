@@ -0,0 +1,138 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+from utils.metrics import METRICS
+
+# 支持的分析方式
+PROFILE_MODES = ("sampling", "cprofile")
+
+
+class SamplingProfiler:
+    """采样分析器
+
+    后台线程按固定间隔采集所有线程的调用栈, 输出 Brendan Gregg 的折叠栈格式（folded stacks）,
+    可直接交给 flamegraph.pl、inferno 或 speedscope 生成火焰图. 采样开销与代码执行路径无关,
+    适合在生产负载下观察热点.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """初始化采样分析器
+
+        Args:
+            interval: 采样间隔（秒）
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str) -> None:
+        """写入折叠栈文件, 每行为 "调用栈 采样次数"
+
+        Args:
+            path: 文件路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_run(mode: str, output_dir: str = "data/profiles", logger=None) -> Iterator[None]:
+    """对一次运行进行性能分析, 每次运行输出一组文件
+
+    * sampling: ``run-<时间>.folded`` 折叠栈文件, 可用 flamegraph.pl / speedscope 查看
+    * cprofile: ``run-<时间>.prof`` pstats 文件, 可用 snakeviz / flameprof / gprof2dot 查看
+
+    同时输出 ``run-<时间>.stages.json``, 记录本次运行各阶段的墙钟耗时和 CPU 耗时.
+
+    Args:
+        mode: 分析方式, sampling 或 cprofile
+        output_dir: 输出目录
+        logger: 日志记录器
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的分析方式: {mode}, 可选值: {', '.join(PROFILE_MODES)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.join(output_dir, datetime.now().strftime("run-%Y%m%d-%H%M%S"))
+    base, index = stem, 1
+    # 同一秒内多次运行时追加序号, 避免覆盖
+    while os.path.exists(f"{base}.stages.json"):
+        index += 1
+        base = f"{stem}-{index}"
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    if mode == "sampling":
+        profiler = SamplingProfiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if mode == "sampling":
+            profiler.stop()
+            path = f"{base}.folded"
+            profiler.write_folded(path)
+        else:
+            profiler.disable()
+            path = f"{base}.prof"
+            profiler.dump_stats(path)
+
+        summary = {
+            "mode": mode,
+            "wall_seconds": time.perf_counter() - wall_start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "stages": {stage: {"wall_seconds": values["sum"], "cpu_seconds": values["cpu_seconds"],
+                               "count": values["count"]}
+                       for stage, values in METRICS.stages().items()},
+        }
+        with open(f"{base}.stages.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        if logger is not None:
+            logger.info(f"性能分析结果已保存: {path}, 墙钟耗时 {summary['wall_seconds']:.2f}s, "
+                        f"CPU 耗时 {summary['cpu_seconds']:.2f}s")
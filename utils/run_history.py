@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.run import RunRecord
+from utils.metrics import METRICS
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]:
+    """按最近秩法计算分位数, 没有数据时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def build_run_record(started_at: float, finished_at: float, counts: Dict[str, int], item_seconds: List[float],
+                     slowest_items: List[Tuple[float, str, str]]) -> RunRecord:
+    """根据本次运行的指标生成运行统计
+
+    Args:
+        started_at: 运行开始时间戳
+        finished_at: 运行结束时间戳
+        counts: 成功、跳过、失败数量, 以及熔断、时间预算等其他信息
+        item_seconds: 每个任务的总耗时（秒）
+        slowest_items: 耗时最长的任务 (耗时, 链接, 标题)
+
+    Returns:
+        RunRecord: 运行统计
+    """
+    stages = {stage: values["count"] for stage, values in METRICS.stages().items()}
+    requests = METRICS.counter_by("http_requests_total", "host")
+    latencies = METRICS.histogram_by("http_request_seconds", "host")
+    tokens = METRICS.counter_by("llm_tokens_total", "kind")
+    saved_bytes = METRICS.counter_by("saved_bytes_total", "account")
+    return RunRecord(
+        started_at=datetime.fromtimestamp(started_at).isoformat(sep=" ", timespec="seconds"),
+        finished_at=datetime.fromtimestamp(finished_at).isoformat(sep=" ", timespec="seconds"),
+        duration_seconds=finished_at - started_at,
+        processed=counts.get("processed", 0),
+        skipped=counts.get("skipped", 0),
+        failed=counts.get("failed", 0),
+        item_p50=percentile(item_seconds, 0.5),
+        item_p95=percentile(item_seconds, 0.95),
+        llm_tokens=int(sum(tokens.values())),
+        http_requests=int(sum(requests.values())),
+        saved_bytes=int(sum(saved_bytes.values())),
+        details={
+            "stages": stages,
+            "http_requests": {host: int(count) for host, count in requests.items()},
+            "http_seconds": {host: histogram.sum / histogram.count
+                             for host, histogram in latencies.items() if histogram.count},
+            "llm_tokens": {kind: int(count) for kind, count in tokens.items()},
+            "saved_bytes": {account: int(count) for account, count in saved_bytes.items()},
+            "slowest_items": [{"seconds": elapsed, "url": url, "title": title}
+                              for elapsed, url, title in sorted(slowest_items, reverse=True)],
+            **{key: value for key, value in counts.items() if key not in ("processed", "skipped", "failed")},
+        }
+    )
+
+
+def _per_movie(value: float, run: RunRecord) -> Optional[float]:
+    return value / run.processed if run.processed else None
+
+
+def _mean(values: Sequence[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return "-".rjust(len(format(0.0, spec))) if value is None else format(value, spec)
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None or before == 0:
+        return "-"
+    return f"{after / before - 1:+.0%}"
+
+
+def format_trends(runs: List[RunRecord]) -> str:
+    """按时间顺序列出各次运行的耗时和成本, 并对比前后两半运行的平均值
+
+    成本按每部成功保存的电影计算: 运行耗时、大模型 token 数量和 HTTP 请求次数.
+    各主机的平均请求耗时和各账号的平均转存速度单独对比, 用于发现逐渐变慢的大模型接口或被限速的账号.
+
+    Args:
+        runs: 按开始时间从早到晚排列的运行统计
+
+    Returns:
+        str: 可直接输出的文本
+    """
+    if not runs:
+        return "还没有运行记录"
+
+    lines = [f"{'开始时间':<19}  {'耗时':>7}  {'成功':>4}  {'跳过':>4}  {'失败':>4}  {'p50':>7}  {'p95':>7}  "
+             f"{'秒/部':>6}  {'token/部':>8}  {'请求/部':>7}"]
+    for run in runs:
+        lines.append(
+            f"{run.started_at:<19}  {run.duration_seconds:6.0f}s  {run.processed:>6}  {run.skipped:>6}  "
+            f"{run.failed:>6}  {_fmt(run.item_p50, '6.1f')}s  {_fmt(run.item_p95, '6.1f')}s  "
+            f"{_fmt(_per_movie(run.duration_seconds, run), '7.1f')}  "
+            f"{_fmt(_per_movie(run.llm_tokens, run), '10.0f')}  {_fmt(_per_movie(run.http_requests, run), '9.1f')}"
+        )
+    if len(runs) < 2:
+        return "\n".join(lines)
+
+    half = len(runs) // 2
+    earlier, recent = runs[:half], runs[half:]
+    lines.append("")
+    lines.append(f"最近 {len(recent)} 次运行与之前 {len(earlier)} 次运行的平均值相比:")
+    metrics = {
+        "任务耗时 p50": lambda run: run.item_p50,
+        "任务耗时 p95": lambda run: run.item_p95,
+        "每部电影耗时": lambda run: _per_movie(run.duration_seconds, run),
+        "每部电影 token": lambda run: _per_movie(run.llm_tokens, run),
+        "每部电影请求数": lambda run: _per_movie(run.http_requests, run),
+    }
+    for name, value in metrics.items():
+        before, after = _mean([value(run) for run in earlier]), _mean([value(run) for run in recent])
+        lines.append(f"    {name:<14} {_fmt(before, '10.2f')} -> {_fmt(after, '10.2f')}  {_change(before, after)}")
+
+    hosts = sorted({host for run in runs for host in run.details.get("http_seconds", {})})
+    for host in hosts:
+        before = _mean([run.details.get("http_seconds", {}).get(host) for run in earlier])
+        after = _mean([run.details.get("http_seconds", {}).get(host) for run in recent])
+        lines.append(f"    请求耗时 {host:<24} {_fmt(before, '7.3f')}s -> {_fmt(after, '7.3f')}s  {_change(before, after)}")
+
+    # 转存阶段的平均速度, 账号被限速时会明显下降
+    accounts = sorted({account for run in runs for account in run.details.get("saved_bytes", {})})
+    for account in accounts:
+        def speed(run: RunRecord) -> Optional[float]:
+            saved = run.details.get("saved_bytes", {}).get(account)
+            return saved / run.duration_seconds / 1024 ** 2 if saved and run.duration_seconds else None
+
+        before, after = _mean([speed(run) for run in earlier]), _mean([speed(run) for run in recent])
+        lines.append(f"    账号 {account} 转存速度 {_fmt(before, '9.1f')}MB/s -> {_fmt(after, '9.1f')}MB/s  "
+                     f"{_change(before, after)}")
+    return "\n".join(lines)
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from utils.circuit_breaker import breaker_states
+from utils.metrics import METRICS
+
+# 状态来源, 名称 -> 返回状态字典的函数; 收集器创建时注册, 关闭时注销
+_sources: Dict[str, Callable[[], Optional[dict]]] = {}
+_sources_lock = threading.Lock()
+
+
+def register_status(name: str, provider: Callable[[], Optional[dict]]) -> None:
+    """注册状态来源, 同名的来源会被替换
+
+    Args:
+        name: 名称, 作为 /status 返回的 JSON 中的键
+        provider: 返回状态字典的函数, 在状态服务的线程中调用, 需要线程安全
+    """
+    with _sources_lock:
+        _sources[name] = provider
+
+
+def unregister_status(name: str, provider: Callable[[], Optional[dict]] = None) -> None:
+    """注销状态来源
+
+    Args:
+        name: 名称
+        provider: 只在当前注册的来源是该函数时注销, 为None时直接注销
+    """
+    with _sources_lock:
+        if provider is None or _sources.get(name) == provider:
+            _sources.pop(name, None)
+
+
+def collect_status() -> dict:
+    """汇总所有状态来源和熔断器状态"""
+    with _sources_lock:
+        sources = dict(_sources)
+    status = {"time": time.time()}
+    for name, provider in sources.items():
+        try:
+            status[name] = provider()
+        except Exception as e:
+            status[name] = {"error": str(e)}
+    status["breakers"] = breaker_states()
+    return status
+
+
+class StatusServer:
+    """内置的状态 HTTP 服务, 在后台线程中运行
+
+    GET /status 返回当前运行的进度、任务队列、各阶段耗时、账号剩余空间和熔断器状态（JSON）,
+    GET /metrics 返回 Prometheus 文本格式的指标, GET /healthz 用于存活检查.
+    只读取内存中的状态和本地数据库, 不会发出外部请求.
+    """
+
+    def __init__(self, port: int, logger, host: str = "0.0.0.0"):
+        """初始化状态服务
+
+        Args:
+            port: 监听端口, 为0时由系统分配
+            logger: 日志记录器
+            host: 监听地址
+        """
+        self.logger = logger
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/status":
+                    body = json.dumps(collect_status(), ensure_ascii=False, default=str)
+                    self._send(200, body, "application/json")
+                elif path == "/metrics":
+                    self._send(200, METRICS.to_prometheus(), "text/plain; version=0.0.4")
+                elif path == "/healthz":
+                    self._send(200, "ok", "text/plain")
+                else:
+                    self._send(404, "not found", "text/plain")
+
+            def _send(self, status: int, body: str, content_type: str) -> None:
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("状态服务请求: %s", format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="status-server", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "StatusServer":
+        self.thread.start()
+        self.logger.info(f"状态服务已启动, 端口 {self.port}: /status, /metrics")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
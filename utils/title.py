@@ -0,0 +1,146 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+# 常见繁体字到简体字的对照, 安装 opencc 时使用 opencc 完整转换
+TRADITIONAL = (
+    "們们個个這这來来時时會会說说對对國国學学發发後后與与無无開开長长門门問问間间關关見见電电戰战龍龙鳥鸟魚鱼"
+    "馬马東东車车風风雲云飛飞愛爱夢梦殺杀傳传記记話话語语聲声亂乱華华萬万歲岁劍剑俠侠鬥斗變变寶宝貓猫獸兽島岛"
+    "奪夺險险雙双難难歡欢樂乐氣气靈灵蟲虫陰阴陽阳獄狱營营偵侦頭头臉脸鐵铁銀银錢钱線线級级紅红綠绿藍蓝黃黄"
+    "聖圣獵猎漢汉劇剧場场憶忆憂忧戀恋雞鸡鴨鸭貝贝嶺岭遠远邊边過过還还進进達达運运連连選选遊游邏逻覺觉親亲"
+    "聽听讀读寫写買买賣卖贏赢輸输將将軍军師师幫帮團团園园圓圆號号計计畫画劃划實实際际權权條条歷历總总"
+    "應应當当現现從从麼么樣样鄉乡觀观體体歸归據据壞坏藝艺醫医藥药療疗驚惊點点黨党齊齐齒齿龜龟"
+)
+_TRADITIONAL_TABLE = str.maketrans({TRADITIONAL[i]: TRADITIONAL[i + 1] for i in range(0, len(TRADITIONAL), 2)})
+
+ROMAN_NUMERALS = {
+    "ii": "2", "iii": "3", "iv": "4", "vi": "6", "vii": "7", "viii": "8", "ix": "9", "xi": "11", "xii": "12",
+    "xiii": "13", "xiv": "14", "xv": "15", "xvi": "16", "xvii": "17", "xviii": "18", "xix": "19", "xx": "20",
+}
+ROMAN_PATTERN = re.compile(r'(?<![a-z])(' + '|'.join(sorted(ROMAN_NUMERALS, key=len, reverse=True)) + r')(?![a-z])')
+NUMBER_PATTERN = re.compile(r'\d+')
+
+_converter = None
+
+
+def _to_simplified(text: str) -> str:
+    global _converter
+    if _converter is None:
+        try:
+            import opencc
+            _converter = opencc.OpenCC("t2s").convert
+        except ImportError:
+            _converter = lambda value: value.translate(_TRADITIONAL_TABLE)
+    return _converter(text)
+
+
+def normalize_title(title: str) -> str:
+    """标准化电影标题, 用于模糊去重
+
+    依次进行全角转半角（NFKC）、转小写、繁体转简体、罗马数字转阿拉伯数字, 最后去掉所有标点、符号和空白.
+    例如 "鬼滴语 2"、"鬼滴語2"、"鬼滴语Ⅱ" 都会得到 "鬼滴语2".
+
+    Args:
+        title: 电影标题
+
+    Returns:
+        str: 标准化后的标题
+    """
+    text = unicodedata.normalize("NFKC", str(title)).lower()
+    text = _to_simplified(text)
+    text = ROMAN_PATTERN.sub(lambda match: ROMAN_NUMERALS[match.group(1)], text)
+    return "".join(char for char in text if unicodedata.category(char)[0] in "LN")
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """计算标准化标题的三元组, 首尾加边界符, 两个字的标题也能得到有效的三元组"""
+    padded = f"^{normalized}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """按年份划分的标题三元组倒排索引
+
+    查询时只在同一年份的标题中按三元组 Jaccard 相似度查找候选, 标准化后完全相同的标题直接命中.
+    相似度达到阈值的标题至少包含查询标题中 ceil(阈值 * 三元组数量) 个三元组, 因此只需从倒排列表最短的
+    前几个三元组中收集候选（前缀过滤）, 常见三元组的长列表不会被遍历.
+    标题中的数字（如续集编号）不同时不视为同一部电影.
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        """初始化索引
+
+        Args:
+            threshold: 相似度阈值, 达到阈值时视为同一部电影
+        """
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.titles: List[Tuple[str, str]] = []  # (原始标题, 标准化标题)
+        self.sizes: List[int] = []  # 各标题的三元组数量
+        self.exact: Dict[Tuple[int, str], int] = {}
+        self.postings: Dict[int, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, title: str, year: int) -> None:
+        """添加标题
+
+        Args:
+            title: 电影标题
+            year: 上映年份
+        """
+        normalized = normalize_title(title)
+        grams = trigrams(normalized)
+        with self.lock:
+            if (year, normalized) in self.exact:
+                return
+            index = len(self.titles)
+            self.titles.append((title, normalized))
+            self.sizes.append(len(grams))
+            self.exact[(year, normalized)] = index
+            postings = self.postings[year]
+            for gram in grams:
+                postings[gram].append(index)
+
+    def find(self, title: str, year: int) -> Optional[str]:
+        """查找同一年份中与标题相似的已有标题
+
+        Args:
+            title: 电影标题
+            year: 上映年份
+
+        Returns:
+            Optional[str]: 找到时返回已有的原始标题, 否则返回None
+        """
+        normalized = normalize_title(title)
+        with self.lock:
+            index = self.exact.get((year, normalized))
+            if index is not None:
+                return self.titles[index][0]
+
+            postings = self.postings.get(year)
+            if not postings:
+                return None
+            grams = trigrams(normalized)
+            lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+            prefix = len(grams) - math.ceil(self.threshold * len(grams)) + 1
+            candidates = {candidate for posting in lists[:prefix] for candidate in posting}
+
+            # 三元组数量相差过大的标题不可能达到阈值
+            min_size, max_size = self.threshold * len(grams), len(grams) / self.threshold
+            numbers = NUMBER_PATTERN.findall(normalized)
+            best, best_score = None, self.threshold
+            for candidate in candidates:
+                if not min_size <= self.sizes[candidate] <= max_size:
+                    continue
+                other_title, other_normalized = self.titles[candidate]
+                other_grams = trigrams(other_normalized)
+                shared = len(grams & other_grams)
+                score = shared / (len(grams) + len(other_grams) - shared)
+                if score >= best_score and NUMBER_PATTERN.findall(other_normalized) == numbers:
+                    best, best_score = other_title, score
+            return best
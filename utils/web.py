@@ -1,16 +1,46 @@
 import logging
 from typing import Optional, Dict, Any, Union
+from urllib.parse import urlsplit
 import time
 import random
 
 import requests
 from requests.exceptions import RequestException
 
+from utils.cassette import REPLAY
+from utils.metrics import METRICS
+
+# 错误日志中最多记录的响应内容长度（字节）
+MAX_LOG_BODY = 512
+
+# 全局录制/回放文件, 为None时直接请求
+_cassette = None
+
+
+def set_cassette(cassette) -> None:
+    """设置全局录制/回放文件, 之后所有 WebRequests 的请求都会被录制或回放
+
+    Args:
+        cassette: utils.cassette.Cassette 对象, 为None时恢复直接请求
+    """
+    global _cassette
+    _cassette = cassette
+
+
+def _truncate_body(response: requests.Response, limit: int = MAX_LOG_BODY) -> str:
+    """截取响应内容用于日志, 避免巨大的错误页面占用日志和内存"""
+    content = response.content or b""
+    text = content[:limit].decode(response.encoding or "utf-8", errors="replace")
+    if len(content) > limit:
+        text += f"...(共 {len(content)} 字节)"
+    return text
+
 
 class WebRequests:
     """网络请求工具类，用于处理HTTP请求"""
     
-    def __init__(self, logger=None, timeout: int = 3, max_retries: int = 3, retry_delay: float = 1.0):
+    def __init__(self, logger=None, timeout: int = 3, max_retries: int = 3, retry_delay: float = 1.0,
+                 breaker=None):
         """初始化网络请求工具
         
         Args:
@@ -18,11 +48,13 @@ class WebRequests:
             timeout: 请求超时时间，单位为秒，默认3秒
             max_retries: 最大重试次数，默认3次
             retry_delay: 重试延迟时间，单位为秒，默认1秒
+            breaker: 熔断器, 连续请求失败或返回 5xx 等状态码时打开, 打开后请求直接失败
         """
         self.logger = logger or logging.getLogger(__name__)
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.breaker = breaker
         
         # 初始化会话
         self.session = requests.session()
@@ -48,41 +80,78 @@ class WebRequests:
             
         Raises:
             RequestException: 请求异常
+            CircuitOpenError: 熔断器已打开
         """
+        if self.breaker is not None:
+            self.breaker.before_call()
+        try:
+            response = self._send(method, url, headers, timeout, encoding, **kwargs)
+        except Exception:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        if self.breaker is not None:
+            if self.breaker.is_failure_status(response.status_code):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return response
+
+    def _send(self, method: str, url: str, headers: Optional[Dict], timeout: Optional[int],
+              encoding: str, **kwargs) -> requests.Response:
+        """执行请求, 请求异常时重试"""
         if timeout is None:
             timeout = self.timeout
             
         # 记录请求信息
-        self.logger.debug(f"{method.upper()} {url}")
+        self.logger.debug("%s %s", method.upper(), url)
         
         # 准备请求参数
         request_kwargs = {'timeout': timeout, **kwargs}
         if headers:
             request_kwargs['headers'] = headers
             
+        host = urlsplit(url).netloc
+
+        # 回放模式下直接返回录制的响应
+        if _cassette is not None and _cassette.mode == REPLAY:
+            start = time.perf_counter()
+            response = _cassette.replay(method, url, request_kwargs)
+            response.encoding = encoding
+            METRICS.observe_http(host, method, response.status_code, time.perf_counter() - start)
+            return response
+
         # 执行请求并重试
         for attempt in range(self.max_retries):
+            start = time.perf_counter()
             try:
                 response = getattr(self.session, method.lower())(url, **request_kwargs)
                 response.encoding = encoding
+                elapsed = time.perf_counter() - start
+                METRICS.observe_http(host, method, response.status_code, elapsed)
+                if _cassette is not None:
+                    _cassette.record(method, url, request_kwargs, response, elapsed)
                 
                 # 记录响应信息
                 if response.status_code != 200:
-                    self.logger.error(f"响应错误 [code={response.status_code}, url={url}]: {response.text}")
+                    self.logger.error("响应错误 [code=%s, url=%s]: %s", response.status_code, url, _truncate_body(response))
                 else:
-                    self.logger.debug(f"响应成功 [code={response.status_code}, url={url}]")
+                    self.logger.debug("响应成功 [code=%s, url=%s]", response.status_code, url)
                     
                 return response
                 
             except RequestException as e:
+                METRICS.observe_http(host, method, "error", time.perf_counter() - start)
+
                 # 最后一次尝试失败时抛出异常
                 if attempt == self.max_retries - 1:
-                    self.logger.error(f"请求失败 [url={url}]: {str(e)}")
+                    self.logger.error("请求失败 [url=%s]: %s", url, e)
                     raise
                 
                 # 重试前等待一段时间
                 retry_wait = self.retry_delay * (1 + random.random())
-                self.logger.warning(f"请求失败，{retry_wait:.1f}秒后重试 ({attempt+1}/{self.max_retries}) [url={url}]: {str(e)}")
+                self.logger.warning("请求失败，%.1f秒后重试 (%d/%d) [url=%s]: %s",
+                                    retry_wait, attempt + 1, self.max_retries, url, e)
                 time.sleep(retry_wait)
 
     def get(self, url: str, headers: Optional[Dict] = None, 